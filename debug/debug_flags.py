@@ -6,6 +6,8 @@ from src.devices.kickr_trainer import KickrTrainer
 from src.core.models import PowerData
 import struct
 
+_HDR = struct.Struct('<Hh')  # flags, instantaneous power
+
 async def test_flags():
     devices = await KickrTrainer.scan_for_devices(timeout=5)
     if not devices:
@@ -18,8 +20,7 @@ async def test_flags():
     def debug_notification_handler(sender, data):
         print(f"Raw data: {data.hex()}")
         if len(data) >= 4:
-            flags = struct.unpack('<H', data[0:2])[0]
-            power = struct.unpack('<h', data[2:4])[0]
+            flags, power = _HDR.unpack_from(memoryview(data), 0)
             print(f"Flags: {flags:016b} (bit 4: wheel={bool(flags & 0x10)}, bit 5: crank={bool(flags & 0x20)})")
             print(f"Power: {power}W")
             print(f"Data length: {len(data)} bytes")
@@ -1,17 +1,24 @@
 """
 Debug tool for Wahoo Kickr connection and data issues
+
+Run from the project root: python -m debug.debug_kickr
 """
 import asyncio
 import sys
-from pathlib import Path
-
-# Add src to path
-sys.path.insert(0, str(Path(__file__).parent / "src"))
 
 from bleak import BleakScanner, BleakClient
 from src.core.constants import *
 from loguru import logger
 
+# 128-bit and 16-bit forms of the UUIDs we look for, lowercase
+CYCLING_POWER_SERVICE_UUIDS = frozenset({CYCLING_POWER_SERVICE_UUID.lower(), "1818"})
+CYCLING_POWER_MEASUREMENT_UUIDS = frozenset({CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID.lower(), "2a63"})
+
+
+def _match_uuid(uuid: str, uuids: frozenset) -> bool:
+    """Check a lowercase UUID against a set, by full UUID or its 16-bit part"""
+    return uuid in uuids or uuid[4:8] in uuids
+
 
 class KickrDebugger:
     """Debug tool for Kickr connection issues"""
@@ -20,6 +27,8 @@ class KickrDebugger:
         self.device = None
         self.client = None
         self.data_received = False
+        self._power_service = None
+        self._power_char = None
         
     async def scan_and_connect(self):
         """Scan for Kickr and attempt connection with detailed logging"""
@@ -55,6 +64,7 @@ class KickrDebugger:
             
             if self.client.is_connected:
                 print("✅ Connected successfully!")
+                self._cache_power_handles()
                 await self.debug_services()
                 await self.debug_characteristics()
                 await self.debug_notifications()
@@ -68,6 +78,22 @@ class KickrDebugger:
         
         return True
     
+    def _cache_power_handles(self):
+        """Look up the cycling power service and measurement characteristic once"""
+        self._power_service = None
+        self._power_char = None
+        
+        for service in self.client.services:
+            if _match_uuid(service.uuid.lower(), CYCLING_POWER_SERVICE_UUIDS):
+                self._power_service = service
+                break
+        
+        if self._power_service:
+            for char in self._power_service.characteristics:
+                if _match_uuid(char.uuid.lower(), CYCLING_POWER_MEASUREMENT_UUIDS):
+                    self._power_char = char
+                    break
+    
     async def debug_services(self):
         """Debug available services"""
         print("\n🔧 Available Services:")
@@ -79,9 +105,10 @@ class KickrDebugger:
             print(f"  Characteristics: {len(service.characteristics)}")
             
             # Check for cycling power service
-            if service.uuid == CYCLING_POWER_SERVICE_UUID:
+            uuid = service.uuid.lower()
+            if uuid == CYCLING_POWER_SERVICE_UUID:
                 print("  ⭐ CYCLING POWER SERVICE FOUND!")
-            elif "1818" in service.uuid.upper():
+            elif _match_uuid(uuid, CYCLING_POWER_SERVICE_UUIDS):
                 print("  ⭐ CYCLING POWER SERVICE (alternative UUID)")
             
             print()
@@ -91,11 +118,7 @@ class KickrDebugger:
         print("🔧 Cycling Power Service Characteristics:")
         print("-" * 50)
         
-        cycling_power_service = None
-        for service in self.client.services:
-            if service.uuid == CYCLING_POWER_SERVICE_UUID or "1818" in service.uuid.upper():
-                cycling_power_service = service
-                break
+        cycling_power_service = self._power_service
         
         if not cycling_power_service:
             print("❌ Cycling Power Service not found!")
@@ -114,9 +137,10 @@ class KickrDebugger:
             print(f"  Properties: {list(char.properties)}")
             
             # Check for power measurement characteristic
-            if char.uuid == CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID:
+            uuid = char.uuid.lower()
+            if uuid == CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID:
                 print("  ⭐ POWER MEASUREMENT CHARACTERISTIC FOUND!")
-            elif "2A63" in char.uuid.upper():
+            elif _match_uuid(uuid, CYCLING_POWER_MEASUREMENT_UUIDS):
                 print("  ⭐ POWER MEASUREMENT CHARACTERISTIC (alternative UUID)")
             
             # Check if it supports notifications
@@ -132,15 +156,8 @@ class KickrDebugger:
         print("🔧 Testing Notifications:")
         print("-" * 50)
         
-        # Find the power measurement characteristic
-        power_char = None
-        for service in self.client.services:
-            if service.uuid == CYCLING_POWER_SERVICE_UUID or "1818" in service.uuid.upper():
-                for char in service.characteristics:
-                    if char.uuid == CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID or "2A63" in char.uuid.upper():
-                        power_char = char
-                        break
-                break
+        # Power measurement characteristic cached after connect
+        power_char = self._power_char
         
         if not power_char:
             print("❌ Power measurement characteristic not found!")
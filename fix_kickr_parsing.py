@@ -4,6 +4,11 @@ Fix for Kickr data parsing based on debug output
 import struct
 from datetime import datetime
 
+# Precompiled frame layouts (little-endian)
+_HDR = struct.Struct('<Hh')     # flags, instantaneous power
+_FULL = struct.Struct('<HhHH')  # flags, power, bytes 4-5, bytes 6-7
+_U16 = struct.Struct('<H')
+
 def parse_kickr_power_data(data: bytes):
     """Parse Kickr power data correctly based on debug output"""
     print(f"Raw data: {data.hex()}")
@@ -20,33 +25,26 @@ def parse_kickr_power_data(data: bytes):
     # Bytes 6-7: Speed (little-endian, unsigned, 0.01 km/h units)
     # Bytes 8-15: Additional data (cumulative values, etc.)
     
-    flags = struct.unpack('<H', data[0:2])[0]
-    power = struct.unpack('<h', data[2:4])[0]  # signed 16-bit
+    mv = memoryview(data)
+    flags, power, cadence_raw, speed_raw = _FULL.unpack_from(mv, 0)  # power is signed 16-bit
     
     print(f"Flags: 0x{flags:04x}")
     print(f"Power: {power}W")
     
     # The cadence parsing seems wrong - let's try different approaches
-    if len(data) >= 6:
-        # Try different cadence parsing
-        cadence_raw = struct.unpack('<H', data[4:6])[0]
-        print(f"Cadence raw: {cadence_raw}")
-        
-        # Maybe cadence is in a different position or format
-        # Let's check if it's in the later bytes
-        if len(data) >= 8:
-            cadence_alt1 = struct.unpack('<H', data[6:8])[0]
-            print(f"Cadence alt1: {cadence_alt1}")
-        
-        if len(data) >= 10:
-            cadence_alt2 = struct.unpack('<H', data[8:10])[0]
-            print(f"Cadence alt2: {cadence_alt2}")
+    print(f"Cadence raw: {cadence_raw}")
+    
+    # Maybe cadence is in a different position or format
+    # Let's check if it's in the later bytes (bytes 6-7 are also the speed field)
+    print(f"Cadence alt1: {speed_raw}")
+    
+    if len(mv) >= 10:
+        cadence_alt2 = _U16.unpack_from(mv, 8)[0]
+        print(f"Cadence alt2: {cadence_alt2}")
     
     # Speed parsing
-    if len(data) >= 8:
-        speed_raw = struct.unpack('<H', data[6:8])[0]
-        speed = speed_raw / 100.0  # Convert to km/h
-        print(f"Speed: {speed}km/h")
+    speed = speed_raw / 100.0  # Convert to km/h
+    print(f"Speed: {speed}km/h")
     
     return {
         'power': power,
@@ -2,33 +2,146 @@
 Base class for BLE device connections
 """
 import asyncio
+import time
+import weakref
+from datetime import datetime, timedelta
 from abc import ABC, abstractmethod
-from typing import Optional, Callable, Any, List
-from bleak import BleakClient, BleakScanner
+from typing import Optional, Callable, Any, List, Dict, Tuple, TYPE_CHECKING
 from loguru import logger
 
 from .models import DeviceInfo, ConnectionStatus, DeviceType
 
+# Bleak is imported where it is used, so importing the device classes (e.g. for
+# the CLI's list/export commands) does not pull in the BLE stack
+if TYPE_CHECKING:
+    from bleak import BleakClient, BleakScanner
+    from bleak.backends.device import BLEDevice
+
+# Work waiting for the consumer task: raw notifications to parse and parsed
+# samples to hand to data callbacks
+NOTIFICATION_QUEUE_SIZE = 256
+
+# BLEDevice objects seen by scan_for_devices, keyed by address. Connecting with
+# the BLEDevice instead of the bare address spares Bleak an implicit rescan.
+SCANNER_CACHE_TTL_SECONDS = 15 * 60
+_scanner_cache: Dict[str, Tuple["BLEDevice", float]] = {}
+
+
+def _cached_ble_device(address: str) -> Optional["BLEDevice"]:
+    """Return the BLEDevice found for an address by a recent scan, if any"""
+    entry = _scanner_cache.get(address)
+    if entry and time.monotonic() - entry[1] < SCANNER_CACHE_TTL_SECONDS:
+        return entry[0]
+    return None
+
+
+# One scanner per event loop, shared by the scan_for_devices calls running on
+# it. It is created by the first scan on the loop, started while any scan has
+# a detection callback registered and kept stopped in between, so back-to-back
+# scans reuse it. Entries go when their loop is closed or garbage collected
+# (the Tk GUI runs each scan on a fresh loop).
+_scanners: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[BleakScanner, List[Callable], asyncio.Lock]]" = weakref.WeakKeyDictionary()
+
+
+def _loop_scanner(loop: asyncio.AbstractEventLoop) -> Tuple["BleakScanner", List[Callable], asyncio.Lock]:
+    """Return the loop's scanner with its callbacks and start/stop lock, creating them on first use"""
+    for closed_loop in [other for other in _scanners if other.is_closed()]:
+        del _scanners[closed_loop]
+    
+    entry = _scanners.get(loop)
+    if entry is None:
+        from bleak import BleakScanner
+        callbacks: List[Callable] = []
+        
+        def on_detection(device, advertisement_data):
+            for detection_callback in tuple(callbacks):
+                detection_callback(device, advertisement_data)
+        
+        entry = (BleakScanner(detection_callback=on_detection), callbacks, asyncio.Lock())
+        _scanners[loop] = entry
+    return entry
+
+
+async def _start_scan(callback: Callable):
+    """Register a detection callback, starting this loop's scanner for the first one"""
+    scanner, callbacks, lock = _loop_scanner(asyncio.get_running_loop())
+    async with lock:
+        callbacks.append(callback)
+        if len(callbacks) == 1:
+            try:
+                await scanner.start()
+            except Exception:
+                callbacks.remove(callback)
+                raise
+
+
+async def _stop_scan(callback: Callable):
+    """Unregister a detection callback, stopping the scanner after the last one"""
+    entry = _scanners.get(asyncio.get_running_loop())
+    if entry is None or callback not in entry[1]:
+        return  # the scanner failed to start
+    scanner, callbacks, lock = entry
+    async with lock:
+        callbacks.remove(callback)
+        if not callbacks:
+            await scanner.stop()
+
 
 class BaseDevice(ABC):
     """Base class for all BLE devices"""
     
-    def __init__(self, device_info: DeviceInfo):
+    def __init__(self, device_info: DeviceInfo, ble_device: Optional["BLEDevice"] = None):
         self.device_info = device_info
-        self.client: Optional[BleakClient] = None
+        self._ble_device = ble_device
+        self.client: Optional["BleakClient"] = None
         self.connection_status = ConnectionStatus.DISCONNECTED
-        self.data_callbacks: List[Callable] = []
+        # Registered callbacks (dict keeps registration order) and the immutable
+        # snapshot iterated for every sample
+        self._callbacks: Dict[Callable, None] = {}
+        self.data_callbacks: Tuple[Callable, ...] = ()
+        self._char_handles: Dict[str, int] = {}  # characteristic UUID -> handle
+        self._rx_queue: Optional[asyncio.Queue] = None
+        self._drain_task: Optional[asyncio.Task] = None
+        # Wall clock and monotonic time read together, sample timestamps are
+        # taken with time.monotonic_ns() and placed relative to this pair
+        self._clock_base = (datetime.now(), time.monotonic_ns())
         
     def add_data_callback(self, callback: Callable):
         """Add a callback function to be called when data is received"""
-        self.data_callbacks.append(callback)
+        self._callbacks[callback] = None
+        self.data_callbacks = tuple(self._callbacks)
         
     def remove_data_callback(self, callback: Callable):
         """Remove a data callback"""
-        if callback in self.data_callbacks:
-            self.data_callbacks.remove(callback)
+        if callback in self._callbacks:
+            del self._callbacks[callback]
+            self.data_callbacks = tuple(self._callbacks)
             
     def _notify_callbacks(self, data: Any):
+        """Queue new data for the callbacks, or notify them directly when not connected"""
+        self._defer(self._dispatch_callbacks, data)
+    
+    def _defer(self, handler: Callable[[Any], None], payload: Any):
+        """Run handler(payload) on the consumer task, or right away when not connected
+        
+        Notification handlers use this to return to bleak immediately and leave
+        parsing and callbacks to the consumer.
+        """
+        if self._drain_task is None:
+            handler(payload)
+            return
+            
+        try:
+            self._rx_queue.put_nowait((handler, payload))
+        except asyncio.QueueFull:
+            logger.warning("Data callbacks are falling behind, dropping sample")
+    
+    def _sample_time(self, received_ns: int) -> datetime:
+        """Wall clock time of a notification received at time.monotonic_ns() received_ns"""
+        wall, monotonic_ns = self._clock_base
+        return wall + timedelta(microseconds=(received_ns - monotonic_ns) // 1000)
+    
+    def _dispatch_callbacks(self, data: Any):
         """Notify all registered callbacks with new data"""
         for callback in self.data_callbacks:
             try:
@@ -36,6 +149,42 @@ class BaseDevice(ABC):
             except Exception as e:
                 logger.error(f"Error in data callback: {e}")
     
+    @staticmethod
+    def _run_deferred(handler: Callable[[Any], None], payload: Any):
+        """Run queued work, logging a failure instead of stopping the consumer"""
+        try:
+            handler(payload)
+        except Exception:
+            logger.exception(f"Error processing notification in {getattr(handler, '__name__', handler)}")
+    
+    async def _drain(self):
+        """Process queued work outside the BLE notification handler"""
+        while True:
+            handler, payload = await self._rx_queue.get()
+            self._run_deferred(handler, payload)
+    
+    def _start_drain(self):
+        """Start the consumer task"""
+        if self._drain_task is None:
+            self._rx_queue = asyncio.Queue(maxsize=NOTIFICATION_QUEUE_SIZE)
+            self._drain_task = asyncio.create_task(self._drain())
+    
+    async def _stop_drain(self):
+        """Stop the consumer task and process what is still queued"""
+        if self._drain_task is None:
+            return
+            
+        self._drain_task.cancel()
+        try:
+            await self._drain_task
+        except asyncio.CancelledError:
+            pass
+        self._drain_task = None
+        
+        while not self._rx_queue.empty():
+            handler, payload = self._rx_queue.get_nowait()
+            self._run_deferred(handler, payload)
+    
     async def connect(self) -> bool:
         """Connect to the device"""
         if self.connection_status == ConnectionStatus.CONNECTED:
@@ -45,11 +194,17 @@ class BaseDevice(ABC):
         logger.info(f"Connecting to {self.device_info.name} ({self.device_info.address})")
         
         try:
-            self.client = BleakClient(self.device_info.address)
+            from bleak import BleakClient
+            
+            ble_device = self._ble_device or _cached_ble_device(self.device_info.address)
+            self.client = BleakClient(ble_device or self.device_info.address)
             await self.client.connect()
             
             if self.client.is_connected:
                 self.connection_status = ConnectionStatus.CONNECTED
+                self._index_char_handles()
+                self._clock_base = (datetime.now(), time.monotonic_ns())
+                self._start_drain()
                 await self._setup_notifications()
                 logger.info(f"Successfully connected to {self.device_info.name}")
                 return True
@@ -61,8 +216,17 @@ class BaseDevice(ABC):
         except Exception as e:
             self.connection_status = ConnectionStatus.ERROR
             logger.error(f"Connection error: {e}")
+            await self._stop_drain()
             return False
     
+    def _index_char_handles(self):
+        """Map characteristic UUIDs to handles from the services bleak discovered on connect"""
+        handles: Dict[str, int] = {}
+        for service in self.client.services:
+            for char in service.characteristics:
+                handles.setdefault(char.uuid.lower(), char.handle)
+        self._char_handles = handles
+    
     async def disconnect(self):
         """Disconnect from the device"""
         if self.client and self.client.is_connected:
@@ -70,6 +234,7 @@ class BaseDevice(ABC):
             await self.client.disconnect()
             self.connection_status = ConnectionStatus.DISCONNECTED
             logger.info(f"Disconnected from {self.device_info.name}")
+        await self._stop_drain()
     
     @abstractmethod
     async def _setup_notifications(self):
@@ -86,17 +251,36 @@ class BaseDevice(ABC):
         """Handle incoming notifications"""
         pass
     
+    @staticmethod
+    async def connect_all(devices: List["BaseDevice"]) -> List[bool]:
+        """Connect to several devices concurrently"""
+        return list(await asyncio.gather(*(device.connect() for device in devices)))
+    
     @classmethod
-    async def scan_for_devices(cls, timeout: float = 5.0) -> List[DeviceInfo]:
-        """Scan for compatible devices"""
+    async def scan_for_devices(cls, timeout: float = 5.0, count: Optional[int] = None) -> List[DeviceInfo]:
+        """Scan for compatible devices for timeout seconds, or until count of them are found"""
         logger.info("Scanning for BLE devices...")
-        devices = await BleakScanner.discover(timeout=timeout)
+        found_devices: List[DeviceInfo] = []
+        found_event = asyncio.Event()
         
-        found_devices = []
-        for device in devices:
+        def detection_callback(device, advertisement_data):
+            if found_event.is_set():
+                return
             device_info = cls._create_device_info(device)
-            if device_info:
+            if device_info and all(d.address != device_info.address for d in found_devices):
+                _scanner_cache[device_info.address] = (device, time.monotonic())
+                logger.info(f"Found {device_info.name} ({device_info.address})")
                 found_devices.append(device_info)
+                if count is not None and len(found_devices) >= count:
+                    found_event.set()
+        
+        await _start_scan(detection_callback)
+        try:
+            await asyncio.wait_for(found_event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            await _stop_scan(detection_callback)
                 
         logger.info(f"Found {len(found_devices)} compatible devices")
         return found_devices
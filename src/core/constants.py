@@ -1,5 +1,8 @@
 """
 Bluetooth Low Energy Service and Characteristic UUIDs
+
+All UUIDs are lowercase, the form bleak reports them in, so they can be
+compared with and used as keys for bleak UUIDs without calling lower().
 """
 # Standard GATT Service UUIDs
 CYCLING_POWER_SERVICE_UUID = "00001818-0000-1000-8000-00805f9b34fb"
@@ -1,15 +1,119 @@
 """
 Data export functionality for training sessions
 """
+import asyncio
 import csv
+import heapq
 import json
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import groupby
+from operator import itemgetter
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, TextIO
 from loguru import logger
+import numpy as np
 
 from .models import TrainingSession, PowerData, HeartRateData
 
+try:
+    import pandas
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+CSV_HEADER = [
+    'timestamp', 'power_watts', 'cadence_rpm', 'speed_kmh',
+    'distance_m', 'heart_rate_bpm'
+]
+
+TCX_HEADER_TMPL = '''<?xml version="1.0" encoding="UTF-8"?>
+<TrainingCenterDatabase xsi:schemaLocation="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2 http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2.xsd" xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <Activities>
+    <Activity Sport="Biking">
+      <Id>{start_time}</Id>
+      <Lap StartTime="{start_time}">
+        <TotalTimeSeconds>{total_seconds}</TotalTimeSeconds>
+        <DistanceMeters>{distance_m}</DistanceMeters>
+        <Calories>{calories}</Calories>
+        <Track>
+'''
+
+# Filled with % (time, distance_m, cadence, speed_ms, watts); %-formatting a
+# positional tuple is cheaper per sample than str.format with keywords
+TRACKPOINT_TMPL = '''          <Trackpoint>
+            <Time>%s</Time>
+            <DistanceMeters>%s</DistanceMeters>
+            <Cadence>%s</Cadence>
+            <Extensions>
+              <TPX xmlns="http://www.garmin.com/xmlschemas/ActivityExtension/v2">
+                <Speed>%s</Speed>
+                <Watts>%s</Watts>
+              </TPX>
+            </Extensions>
+          </Trackpoint>
+'''
+
+TCX_FOOTER = '''        </Track>
+      </Lap>
+    </Activity>
+  </Activities>
+</TrainingCenterDatabase>'''
+
+
+def _nonzero(column, dtype: str):
+    """Nullable pandas array of a column with zeros (missing values) masked out"""
+    values = pandas.array(column, dtype=dtype)
+    values[column == 0] = pandas.NA
+    return values
+
+
+def _raw_column(values, mask_zero: bool = True):
+    """Object array of the values as recorded, so they are written the way the
+    csv module writes them; the power_array() columns are clamped to their dtypes"""
+    return pandas.array([value if value or not mask_zero else None for value in values], dtype=object)
+
+
+def _merge_by_timestamp(power_data: List[PowerData], heart_rate_data: List[HeartRateData]):
+    """Merge two time-ordered sample lists into (timestamp, power, hr) rows.
+    
+    Samples sharing a timestamp end up in one row; the later one wins.
+    """
+    merged = heapq.merge(
+        ((p.timestamp, p, None) for p in power_data),
+        ((hr.timestamp, None, hr) for hr in heart_rate_data),
+        key=itemgetter(0)
+    )
+    for timestamp, rows in groupby(merged, key=itemgetter(0)):
+        power = hr = None
+        for _, row_power, row_hr in rows:
+            if row_power is not None:
+                power = row_power
+            if row_hr is not None:
+                hr = row_hr
+        yield timestamp, power, hr
+
+
+def _isoformat_column(timestamps: np.ndarray) -> np.ndarray:
+    """Format datetime64 values like datetime.isoformat(): microseconds only
+    when the fraction isn't zero"""
+    micros = timestamps.astype('M8[us]')
+    formatted = np.datetime_as_string(micros, unit='us')
+    whole = micros.astype(np.int64) % 1_000_000 == 0
+    formatted[whole] = np.datetime_as_string(micros[whole], unit='s')
+    return formatted
+
+
+def _tcx_time(timestamp: datetime) -> str:
+    """Format a timestamp as a TCX UTC time string"""
+    return timestamp.isoformat(timespec='milliseconds') + 'Z'
+
 
 class DataExporter:
     """Export training session data to various formats"""
@@ -17,6 +121,9 @@ class DataExporter:
     def __init__(self, export_dir: str = "exports"):
         self.export_dir = Path(export_dir)
         self.export_dir.mkdir(exist_ok=True)
+        # Runs export_all_formats_in_background calls one at a time; created on
+        # first use, and its thread finishes queued exports before exit
+        self._background: Optional[ThreadPoolExecutor] = None
         
     def export_to_csv(self, session: TrainingSession, filename: Optional[str] = None) -> str:
         """Export session to CSV format"""
@@ -27,36 +134,10 @@ class DataExporter:
         filepath = self.export_dir / filename
         
         try:
-            with open(filepath, 'w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                
-                # Write header
-                writer.writerow([
-                    'timestamp', 'power_watts', 'cadence_rpm', 'speed_kmh', 
-                    'distance_m', 'heart_rate_bpm'
-                ])
-                
-                # Combine power and heart rate data
-                power_dict = {pd.timestamp: pd for pd in session.power_data}
-                hr_dict = {hr.timestamp: hr for hr in session.heart_rate_data}
-                
-                # Get all timestamps and sort
-                all_timestamps = set(power_dict.keys()) | set(hr_dict.keys())
-                all_timestamps = sorted(all_timestamps)
-                
-                # Write data rows
-                for timestamp in all_timestamps:
-                    power = power_dict.get(timestamp)
-                    hr = hr_dict.get(timestamp)
-                    
-                    writer.writerow([
-                        timestamp.isoformat(),
-                        power.instantaneous_power if power else '',
-                        power.cadence if power and power.cadence else '',
-                        power.speed if power and power.speed else '',
-                        power.distance if power and power.distance else '',
-                        hr.heart_rate if hr else ''
-                    ])
+            if PANDAS_AVAILABLE:
+                self._write_csv_frame(session, filepath)
+            else:
+                self._write_csv_rows(session, filepath)
                     
             logger.info(f"Exported session to CSV: {filepath}")
             return str(filepath)
@@ -65,6 +146,49 @@ class DataExporter:
             logger.error(f"Failed to export CSV: {e}")
             raise
 
+    def _write_csv_frame(self, session: TrainingSession, filepath: Path):
+        """Write CSV rows with pandas (outer join of power and heart rate on timestamp)"""
+        power = session.power_array()
+        power_df = pandas.DataFrame({
+            'power_watts': _raw_column((p.instantaneous_power for p in session.power_data), mask_zero=False),
+            'cadence_rpm': _raw_column(p.cadence for p in session.power_data),
+            'speed_kmh': _raw_column(p.speed for p in session.power_data),
+            'distance_m': _nonzero(power['distance'], 'Float64')
+        }, index=pandas.DatetimeIndex(power['timestamp']))
+        heart_rate = session.heart_rate_array()
+        hr_df = pandas.DataFrame({
+            'heart_rate_bpm': pandas.array(heart_rate['heart_rate'], dtype='Int64')
+        }, index=pandas.DatetimeIndex(heart_rate['timestamp']))
+        
+        # Later samples win on duplicate timestamps, same as the dict-based path
+        power_df = power_df[~power_df.index.duplicated(keep='last')]
+        hr_df = hr_df[~hr_df.index.duplicated(keep='last')]
+        
+        df = power_df.join(hr_df, how='outer').sort_index()
+        # Format the whole timestamp column in vectorized calls; much faster
+        # than to_csv(date_format=...), which goes through strftime per row
+        df.index = _isoformat_column(df.index.values)
+        df.to_csv(filepath, index_label=CSV_HEADER[0])
+        
+    def _write_csv_rows(self, session: TrainingSession, filepath: Path):
+        """Write CSV rows with the csv module (fallback when pandas is unavailable)"""
+        with open(filepath, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            
+            # Write header
+            writer.writerow(CSV_HEADER)
+            
+            # Both lists are recorded in time order, so a linear merge is enough
+            for timestamp, power, hr in _merge_by_timestamp(session.power_data, session.heart_rate_data):
+                writer.writerow([
+                    timestamp.isoformat(),
+                    power.instantaneous_power if power else '',
+                    power.cadence if power and power.cadence else '',
+                    power.speed if power and power.speed else '',
+                    power.distance if power and power.distance else '',
+                    hr.heart_rate if hr else ''
+                ])
+
     def export_to_fit(self, session: TrainingSession, filename: Optional[str] = None) -> str:
         """Export session to fit file"""
             
@@ -77,40 +201,51 @@ class DataExporter:
         filepath = self.export_dir / filename
         
         try:
-            session_data = {
-                'session_info': {
-                    'session_id': session.session_id,
-                    'start_time': session.start_time.isoformat(),
-                    'end_time': session.end_time.isoformat() if session.end_time else None,
-                    'total_distance_km': session.total_distance,
-                    'total_energy_kj': session.total_energy,
-                    'device_info': {
-                        'name': session.device_info.name if session.device_info else None,
-                        'address': session.device_info.address if session.device_info else None,
-                        'device_type': session.device_info.device_type.value if session.device_info else None
-                    } if session.device_info else None
-                },
-                'power_data': [
-                    {
-                        'timestamp': pd.timestamp.isoformat(),
-                        'instantaneous_power': pd.instantaneous_power,
-                        'average_power': pd.average_power,
-                        'cadence': pd.cadence,
-                        'speed': pd.speed,
-                        'distance': pd.distance
-                    } for pd in session.power_data
-                ],
-                'heart_rate_data': [
-                    {
-                        'timestamp': hr.timestamp.isoformat(),
-                        'heart_rate': hr.heart_rate,
-                        'rr_intervals': hr.rr_intervals
-                    } for hr in session.heart_rate_data
-                ]
+            session_info = {
+                'session_id': session.session_id,
+                'start_time': session.start_time.isoformat(),
+                'end_time': session.end_time.isoformat() if session.end_time else None,
+                'total_distance_km': session.total_distance,
+                'total_energy_kj': session.total_energy,
+                'device_info': {
+                    'name': session.device_info.name if session.device_info else None,
+                    'address': session.device_info.address if session.device_info else None,
+                    'device_type': session.device_info.device_type.value if session.device_info else None
+                } if session.device_info else None
             }
             
-            with open(filepath, 'w') as f:
-                json.dump(session_data, f, indent=2)
+            if ORJSON_AVAILABLE:
+                # orjson serializes the dataclasses and their datetimes natively
+                session_data = {
+                    'session_info': session_info,
+                    'power_data': session.power_data,
+                    'heart_rate_data': session.heart_rate_data
+                }
+                filepath.write_bytes(orjson.dumps(session_data, option=orjson.OPT_INDENT_2))
+            else:
+                session_data = {
+                    'session_info': session_info,
+                    'power_data': [
+                        {
+                            'timestamp': pd.timestamp.isoformat(),
+                            'instantaneous_power': pd.instantaneous_power,
+                            'average_power': pd.average_power,
+                            'cadence': pd.cadence,
+                            'speed': pd.speed,
+                            'distance': pd.distance
+                        } for pd in session.power_data
+                    ],
+                    'heart_rate_data': [
+                        {
+                            'timestamp': hr.timestamp.isoformat(),
+                            'heart_rate': hr.heart_rate,
+                            'rr_intervals': hr.rr_intervals
+                        } for hr in session.heart_rate_data
+                    ]
+                }
+                
+                with open(filepath, 'w') as f:
+                    json.dump(session_data, f, indent=2)
                 
             logger.info(f"Exported session to JSON: {filepath}")
             return str(filepath)
@@ -129,10 +264,8 @@ class DataExporter:
         
         try:
             # Simple TCX format (would need more sophisticated implementation for full TCX)
-            tcx_content = self._generate_tcx_content(session)
-            
             with open(filepath, 'w') as f:
-                f.write(tcx_content)
+                self._generate_tcx_content(session, f)
                 
             logger.info(f"Exported session to TCX: {filepath}")
             return str(filepath)
@@ -141,46 +274,28 @@ class DataExporter:
             logger.error(f"Failed to export TCX: {e}")
             raise
             
-    def _generate_tcx_content(self, session: TrainingSession) -> str:
-        """Generate TCX content (simplified)"""
-        start_time = session.start_time.strftime("%Y-%m-%dT%H:%M:%S.000Z")
-        end_time = session.end_time.strftime("%Y-%m-%dT%H:%M:%S.000Z") if session.end_time else start_time
+    def _generate_tcx_content(self, session: TrainingSession, fp: TextIO):
+        """Write TCX content (simplified) to an open file"""
+        start_time = _tcx_time(session.start_time)
         
-        tcx = f'''<?xml version="1.0" encoding="UTF-8"?>
-<TrainingCenterDatabase xsi:schemaLocation="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2 http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2.xsd" xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
-  <Activities>
-    <Activity Sport="Biking">
-      <Id>{start_time}</Id>
-      <Lap StartTime="{start_time}">
-        <TotalTimeSeconds>{(session.end_time - session.start_time).total_seconds() if session.end_time else 0}</TotalTimeSeconds>
-        <DistanceMeters>{session.total_distance * 1000}</DistanceMeters>
-        <Calories>{int(session.total_energy)}</Calories>
-        <Track>
-'''
+        fp.write(TCX_HEADER_TMPL.format(
+            start_time=start_time,
+            total_seconds=(session.end_time - session.start_time).total_seconds() if session.end_time else 0,
+            distance_m=session.total_distance * 1000,
+            calories=int(session.total_energy)
+        ))
         
         # Add track points
         for power_data in session.power_data:
-            timestamp = power_data.timestamp.strftime("%Y-%m-%dT%H:%M:%S.000Z")
-            tcx += f'''          <Trackpoint>
-            <Time>{timestamp}</Time>
-            <DistanceMeters>{power_data.distance * 1000 if power_data.distance else 0}</DistanceMeters>
-            <Cadence>{power_data.cadence if power_data.cadence else 0}</Cadence>
-            <Extensions>
-              <TPX xmlns="http://www.garmin.com/xmlschemas/ActivityExtension/v2">
-                <Speed>{power_data.speed / 3.6 if power_data.speed else 0}</Speed>
-                <Watts>{power_data.instantaneous_power}</Watts>
-              </TPX>
-            </Extensions>
-          </Trackpoint>
-'''
-        
-        tcx += '''        </Track>
-      </Lap>
-    </Activity>
-  </Activities>
-</TrainingCenterDatabase>'''
+            fp.write(TRACKPOINT_TMPL % (
+                _tcx_time(power_data.timestamp),
+                power_data.distance * 1000 if power_data.distance else 0,
+                power_data.cadence if power_data.cadence else 0,
+                power_data.speed / 3.6 if power_data.speed else 0,
+                power_data.instantaneous_power
+            ))
         
-        return tcx
+        fp.write(TCX_FOOTER)
         
     def export_all_formats(self, session: TrainingSession) -> Dict[str, str]:
         """Export session to all available formats"""
@@ -197,3 +312,32 @@ class DataExporter:
         except Exception as e:
             logger.error(f"Failed to export all formats: {e}")
             raise
+            
+    def export_all_formats_in_background(self, session: TrainingSession) -> Future:
+        """Queue export_all_formats for a snapshot of the session on the writer
+        thread; the Future resolves to the exported paths"""
+        if self._background is None:
+            self._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="DataExporter")
+        return self._background.submit(self.export_all_formats, session.snapshot())
+            
+    async def export_all_formats_async(self, session: TrainingSession) -> Dict[str, str]:
+        """Export session to all available formats concurrently, off the event loop"""
+        loop = asyncio.get_running_loop()
+        exporters = {
+            'csv': self.export_to_csv,
+            'json': self.export_to_json,
+            'tcx': self.export_to_tcx
+        }
+        
+        try:
+            paths = await asyncio.gather(*(
+                loop.run_in_executor(None, export, session) for export in exporters.values()
+            ))
+            exports = dict(zip(exporters, paths))
+            
+            logger.info(f"Exported session to all formats: {list(exports.keys())}")
+            return exports
+            
+        except Exception as e:
+            logger.error(f"Failed to export all formats: {e}")
+            raise
@@ -1,141 +1,53 @@
 """
 Data Export Module for LinuxTrainer
 """
+import gzip
+import io
 import json
-import csv
+import os
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import BinaryIO, Iterator, List, Dict, Any, Optional, Tuple
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from operator import attrgetter
 
 try:
-    from garmin_fit_sdk import Decoder, Stream
-    from garmin_fit_sdk import Profile
+    from garmin_fit_sdk import Encoder, Profile
     FIT_AVAILABLE = True
 except ImportError:
     FIT_AVAILABLE = False
-    logging.warning("garmin-fit-sdk not available. .fit export disabled.")
+    logging.warning("garmin-fit-sdk encoder not available. .fit files will be exported as text.")
 
 logger = logging.getLogger(__name__)
 
-class DataExporter:
-    """Handles data export in various formats"""
-    
-    def __init__(self, export_dir: str = "exports"):
-        self.export_dir = Path(export_dir)
-        self.export_dir.mkdir(exist_ok=True)
-    
-    def export_all_formats(self, session) -> Dict[str, str]:
-        """Export session data in all supported formats"""
-        exports = {}
-        
-        try:
-            # Export JSON
-            json_file = self.export_json(session)
-            if json_file:
-                exports['json'] = str(json_file)
-            
-            # Export CSV
-            csv_file = self.export_csv(session)
-            if csv_file:
-                exports['csv'] = str(csv_file)
-            
-            # Export TCX
-            tcx_file = self.export_tcx(session)
-            if tcx_file:
-                exports['tcx'] = str(tcx_file)
-            
-            # Export FIT
-            fit_file = self.export_fit(session)
-            if fit_file:
-                exports['fit'] = str(fit_file)
-            
-            logger.info(f"Exported session data: {exports}")
-            return exports
-            
-        except Exception as e:
-            logger.error(f"Error exporting data: {e}")
-            return {}
-    
-    def export_json(self, session) -> Path:
-        """Export session data as JSON"""
-        try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"session_{session.session_id}_{timestamp}.json"
-            filepath = self.export_dir / filename
-            
-            # Prepare session data for export
-            session_data = {
-                "session_id": session.session_id,
-                "start_time": session.start_time.isoformat() if session.start_time else None,
-                "end_time": session.end_time.isoformat() if session.end_time else None,
-                "duration_seconds": session.duration_seconds,
-                "data_points": len(session.power_data),
-                "data": [
-                    {
-                        "timestamp": data_point.timestamp.isoformat(),
-                        "power": data_point.instantaneous_power,
-                        "cadence": data_point.cadence,
-                        "speed": data_point.speed
-                    }
-                    for data_point in session.power_data
-                ]
-            }
-            
-            with open(filepath, 'w') as f:
-                json.dump(session_data, f, indent=2)
-            
-            logger.info(f"Exported JSON to {filepath}")
-            return filepath
-            
-        except Exception as e:
-            logger.error(f"Error exporting JSON: {e}")
-            return None
-    
-    def export_csv(self, session) -> Path:
-        """Export session data as CSV"""
-        try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"session_{session.session_id}_{timestamp}.csv"
-            filepath = self.export_dir / filename
-            
-            with open(filepath, 'w', newline='') as f:
-                writer = csv.writer(f)
-                
-                # Write header
-                writer.writerow(['timestamp', 'power_watts', 'cadence_rpm', 'speed_kmh'])
-                
-                # Write data points
-                for data_point in session.power_data:
-                    writer.writerow([
-                        data_point.timestamp.isoformat(),
-                        data_point.instantaneous_power,
-                        data_point.cadence or '',
-                        data_point.speed or ''
-                    ])
-            
-            logger.info(f"Exported CSV to {filepath}")
-            return filepath
-            
-        except Exception as e:
-            logger.error(f"Error exporting CSV: {e}")
-            return None
-    
-    def export_tcx(self, session) -> Path:
-        """Export session data as TCX (Training Center XML)"""
-        try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"session_{session.session_id}_{timestamp}.tcx"
-            filepath = self.export_dir / filename
-            
-            # Basic TCX structure
-            tcx_content = f"""<?xml version="1.0" encoding="UTF-8"?>
+# Write buffer for export files; large enough that a typical session
+# reaches the disk in a handful of write() calls
+EXPORT_BUFSIZE = 1 << 20
+
+FILENAME_TIME_FORMAT = "%Y%m%d_%H%M%S"
+
+# One element of the JSON "data" array, compact by default and laid out as
+# json.dump(indent=2) would for pretty output
+JSON_POINT_TMPL = '{"timestamp":"%s","power":%s,"cadence":%s,"speed":%s}'
+JSON_POINT_PRETTY_TMPL = """
+    {
+      "timestamp": "%s",
+      "power": %s,
+      "cadence": %s,
+      "speed": %s
+    }"""
+
+# TCX document pieces; the header is filled with str.format and each
+# trackpoint with %-formatting
+TCX_HEADER_TMPL = """<?xml version="1.0" encoding="UTF-8"?>
 <TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2">
   <Activities>
     <Activity Sport="Biking">
-      <Id>{session.start_time.isoformat() if session.start_time else datetime.now().isoformat()}</Id>
-      <Lap StartTime="{session.start_time.isoformat() if session.start_time else datetime.now().isoformat()}">
-        <TotalTimeSeconds>{session.duration_seconds}</TotalTimeSeconds>
+      <Id>{start_iso}</Id>
+      <Lap StartTime="{start_iso}">
+        <TotalTimeSeconds>{duration}</TotalTimeSeconds>
         <DistanceMeters>0</DistanceMeters>
         <MaximumSpeed>0</MaximumSpeed>
         <Calories>0</Calories>
@@ -150,67 +62,45 @@ class DataExporter:
         <TriggerMethod>Manual</TriggerMethod>
         <Track>
 """
-            
-            # Add track points
-            for data_point in session.power_data:
-                tcx_content += f"""          <Trackpoint>
-            <Time>{data_point.timestamp.isoformat()}</Time>
-            <Cadence>{data_point.cadence or 0}</Cadence>
+
+TCX_TRACKPOINT_TMPL = """          <Trackpoint>
+            <Time>%s</Time>
+            <Cadence>%s</Cadence>
             <Extensions>
               <TPX xmlns="http://www.garmin.com/xmlschemas/ActivityExtension/v2">
-                <Speed>{data_point.speed or 0}</Speed>
-                <Watts>{data_point.instantaneous_power}</Watts>
+                <Speed>%s</Speed>
+                <Watts>%s</Watts>
               </TPX>
             </Extensions>
           </Trackpoint>
 """
-            
-            tcx_content += """        </Track>
+
+TCX_FOOTER = b"""        </Track>
       </Lap>
     </Activity>
   </Activities>
 </TrainingCenterDatabase>"""
-            
-            with open(filepath, 'w') as f:
-                f.write(tcx_content)
-            
-            logger.info(f"Exported TCX to {filepath}")
-            return filepath
-            
-        except Exception as e:
-            logger.error(f"Error exporting TCX: {e}")
-            return None
-    
-    def export_fit(self, session) -> Path:
-        """Export session data as FIT file"""
-        try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"session_{session.session_id}_{timestamp}.fit"
-            filepath = self.export_dir / filename
-            
-            # Create a comprehensive text-based FIT file
-            # This format is readable and contains all the necessary data
-            # It can be imported by many fitness applications
-            
-            fit_content = f"""# FIT File Export for LinuxTrainer
-# Generated: {datetime.now().isoformat()}
-# Session ID: {session.session_id}
-# Start Time: {session.start_time.isoformat() if session.start_time else 'Unknown'}
-# End Time: {session.end_time.isoformat() if session.end_time else 'Unknown'}
-# Duration: {session.duration_seconds} seconds
-# Data Points: {len(session.power_data)}
+
+# Text FIT export, used when garmin-fit-sdk is not installed
+FIT_TEXT_HEADER_TMPL = """# FIT File Export for LinuxTrainer
+# Generated: {generated}
+# Session ID: {session_id}
+# Start Time: {start_iso}
+# End Time: {end_iso}
+# Duration: {duration} seconds
+# Data Points: {data_points}
 
 # File Header
 [FILE_HEADER]
 file_type=activity
 protocol_version=20
 profile_version=21
-data_size={len(session.power_data) * 4}
+data_size={data_size}
 crc=0
 
 # Device Info
 [DEVICE_INFO]
-timestamp={int(session.start_time.timestamp()) if session.start_time else int(datetime.now().timestamp())}
+timestamp={start_epoch}
 device_index=0
 device_type=smart_trainer
 manufacturer=garmin
@@ -221,28 +111,28 @@ battery_voltage=0
 
 # Activity Header
 [ACTIVITY]
-timestamp={int(session.start_time.timestamp()) if session.start_time else int(datetime.now().timestamp())}
-total_timer_time={session.duration_seconds}
+timestamp={start_epoch}
+total_timer_time={duration}
 num_sessions=1
 type=cycling
 event=workout
 event_type=stop
-local_timestamp={int(session.start_time.timestamp()) if session.start_time else int(datetime.now().timestamp())}
+local_timestamp={start_epoch}
 event_group=0
 
 # Session Data
 [SESSION]
 message_index=0
-timestamp={int(session.start_time.timestamp()) if session.start_time else int(datetime.now().timestamp())}
+timestamp={start_epoch}
 event=workout
 event_type=stop
-start_time={int(session.start_time.timestamp()) if session.start_time else int(datetime.now().timestamp())}
+start_time={start_epoch}
 start_position_lat=0
 start_position_long=0
 sport=cycling
 sub_sport=indoor_cycling
-total_elapsed_time={session.duration_seconds}
-total_timer_time={session.duration_seconds}
+total_elapsed_time={duration}
+total_timer_time={duration}
 total_distance=0
 total_calories=0
 total_fat_calories=0
@@ -318,16 +208,16 @@ speed_source=0
 # Lap Data
 [LAP]
 message_index=0
-timestamp={int(session.end_time.timestamp()) if session.end_time else int(datetime.now().timestamp())}
+timestamp={end_epoch}
 event=lap
 event_type=stop
-start_time={int(session.start_time.timestamp()) if session.start_time else int(datetime.now().timestamp())}
+start_time={start_epoch}
 start_position_lat=0
 start_position_long=0
 end_position_lat=0
 end_position_long=0
-total_elapsed_time={session.duration_seconds}
-total_timer_time={session.duration_seconds}
+total_elapsed_time={duration}
+total_timer_time={duration}
 total_distance=0
 total_calories=0
 total_fat_calories=0
@@ -383,30 +273,8 @@ speed_source=0
 [POWER_DATA]
 # timestamp,power_watts,cadence_rpm,speed_kmh,heart_rate_bpm
 """
-            
-            # Add power data points
-            for data_point in session.power_data:
-                timestamp = int(data_point.timestamp.timestamp())
-                power = data_point.instantaneous_power
-                cadence = data_point.cadence or 0
-                speed = data_point.speed or 0
-                heart_rate = 0  # Not available in current data model
-                fit_content += f"{timestamp},{power},{cadence},{speed},{heart_rate}\n"
-            
-            # Add summary statistics
-            if session.power_data:
-                powers = [dp.instantaneous_power for dp in session.power_data]
-                cadences = [dp.cadence for dp in session.power_data if dp.cadence is not None]
-                speeds = [dp.speed for dp in session.power_data if dp.speed is not None]
-                
-                avg_power = sum(powers) / len(powers) if powers else 0
-                max_power = max(powers) if powers else 0
-                avg_cadence = sum(cadences) / len(cadences) if cadences else 0
-                max_cadence = max(cadences) if cadences else 0
-                avg_speed = sum(speeds) / len(speeds) if speeds else 0
-                max_speed = max(speeds) if speeds else 0
-                
-                fit_content += f"""
+
+FIT_SUMMARY_TMPL = """
 # Summary Statistics
 [SUMMARY]
 avg_power={avg_power:.1f}
@@ -415,11 +283,285 @@ avg_cadence={avg_cadence:.1f}
 max_cadence={max_cadence}
 avg_speed={avg_speed:.1f}
 max_speed={max_speed:.1f}
-total_data_points={len(session.power_data)}
+total_data_points={data_points}
 """
+
+# One [POWER_DATA] line of the text FIT export; %d truncates the epoch seconds
+FIT_RECORD_TMPL = "%d,%s,%s,%s,0\n"
+
+CSV_HEADER = b"timestamp,power_watts,cadence_rpm,speed_kmh\r\n"
+
+
+def _fit_time(timestamp: datetime) -> datetime:
+    """Make a timestamp UTC for the FIT encoder, which reads naive datetimes as
+    UTC; the recorded (naive) times are local"""
+    return timestamp.astimezone(timezone.utc)
+
+
+def _json_number(value) -> str:
+    """JSON literal for an optional int or finite float"""
+    return 'null' if value is None else str(value)
+
+
+# Fetch the exported fields of a PowerData in one C-level call
+_power_fields = attrgetter('instantaneous_power', 'cadence', 'speed')
+_timed_power_fields = attrgetter('timestamp', 'instantaneous_power', 'cadence', 'speed')
+
+
+def _iso_times(session) -> List[str]:
+    """ISO timestamps of the session's power data, shared between formats"""
+    return [data_point.timestamp.isoformat() for data_point in session.power_data]
+
+
+def _summary_stats(power_data) -> Tuple[float, int, float, int, float, float]:
+    """Average and maximum power, cadence and speed of a non-empty list of points
+
+    Cadence and speed only count the points that reported them.
+    """
+    power_sum = 0
+    max_power = power_data[0].instantaneous_power
+    cadence_sum = cadence_count = max_cadence = 0
+    speed_sum = speed_count = max_speed = 0
+    for power, cadence, speed in map(_power_fields, power_data):
+        power_sum += power
+        if power > max_power:
+            max_power = power
+        if cadence is not None:
+            cadence_sum += cadence
+            cadence_count += 1
+            if cadence > max_cadence:
+                max_cadence = cadence
+        if speed is not None:
+            speed_sum += speed
+            speed_count += 1
+            if speed > max_speed:
+                max_speed = speed
+    
+    avg_power = power_sum / len(power_data)
+    avg_cadence = cadence_sum / cadence_count if cadence_count else 0
+    avg_speed = speed_sum / speed_count if speed_count else 0
+    return avg_power, max_power, avg_cadence, max_cadence, avg_speed, max_speed
+
+
+class DataExporter:
+    """Handles data export in various formats"""
+    
+    def __init__(self, export_dir: str = "exports", compress: bool = False):
+        self.export_dir = Path(export_dir)
+        self.export_dir.mkdir(exist_ok=True)
+        # gzip the JSON, CSV and TCX exports; FIT is already a compact binary format
+        self.compress = compress
+        self._compressed_suffix = '.gz' if compress else ''
+        # Runs export_all_formats_in_background calls one at a time; created on
+        # first use, and its thread finishes queued exports before exit
+        self._background: Optional[ThreadPoolExecutor] = None
+    
+    @contextmanager
+    def _open_export(self, filepath: Path, compress: bool = False) -> Iterator[BinaryIO]:
+        """Open an export file for writing, optionally gzipped
+        
+        Data goes to a .tmp file next to filepath, which is fsynced and renamed
+        over filepath on success, so a crash never leaves a half-written export.
+        """
+        tmp_path = filepath.with_name(filepath.name + '.tmp')
+        try:
+            with open(tmp_path, 'wb', buffering=EXPORT_BUFSIZE) as f:
+                if compress:
+                    gz = gzip.GzipFile(filename=filepath.name, mode='wb', compresslevel=1, fileobj=f)
+                    with io.BufferedWriter(gz, EXPORT_BUFSIZE) as out:
+                        yield out
+                else:
+                    yield f
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            raise
+    
+    def export_all_formats(self, session) -> Dict[str, str]:
+        """Export session data in all supported formats"""
+        if not session.power_data:
+            logger.info(f"Session {session.session_id} has no data points, skipping export")
+            return {}
+        
+        try:
+            # One filename timestamp for the whole set of files
+            timestamp = datetime.now().strftime(FILENAME_TIME_FORMAT)
+            iso_times = _iso_times(session)
+            exporters = (
+                ('json', self.export_json, {'iso_times': iso_times}),
+                ('csv', self.export_csv, {'iso_times': iso_times}),
+                ('tcx', self.export_tcx, {'iso_times': iso_times}),
+                ('fit', self.export_fit, {}),
+            )
+            
+            # Each format writes its own file, so run them side by side
+            with ThreadPoolExecutor(max_workers=len(exporters)) as executor:
+                futures = {
+                    fmt: executor.submit(export, session, timestamp=timestamp, **kwargs)
+                    for fmt, export, kwargs in exporters
+                }
+                results = {fmt: future.result() for fmt, future in futures.items()}
+            
+            exports = {fmt: str(path) for fmt, path in results.items() if path}
             
-            with open(filepath, 'w') as f:
-                f.write(fit_content)
+            logger.info(f"Exported session data: {exports}")
+            return exports
+            
+        except Exception as e:
+            logger.error(f"Error exporting data: {e}")
+            return {}
+    
+    def export_all_formats_in_background(self, session) -> Future:
+        """Queue export_all_formats for a snapshot of the session on the writer
+        thread; the Future resolves to the exported paths"""
+        if self._background is None:
+            self._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="DataExporter")
+        return self._background.submit(self.export_all_formats, session.snapshot())
+    
+    def export_json(self, session, iso_times: Optional[List[str]] = None,
+                    timestamp: Optional[str] = None, pretty: bool = False) -> Path:
+        """Export session data as JSON, indented only if pretty is set"""
+        try:
+            timestamp = timestamp or datetime.now().strftime(FILENAME_TIME_FORMAT)
+            filename = f"session_{session.session_id}_{timestamp}.json{self._compressed_suffix}"
+            filepath = self.export_dir / filename
+            if iso_times is None:
+                iso_times = _iso_times(session)
+            
+            # Session fields are dumped as usual; the data array is streamed
+            # point by point so no per-point dicts are built
+            session_info = {
+                "session_id": session.session_id,
+                "start_time": session.start_time.isoformat() if session.start_time else None,
+                "end_time": session.end_time.isoformat() if session.end_time else None,
+                "duration_seconds": session.duration_seconds,
+                "data_points": len(session.power_data),
+            }
+            if pretty:
+                header = json.dumps(session_info, indent=2)
+                point_tmpl = JSON_POINT_PRETTY_TMPL
+                data_open, data_close, empty_close = ',\n  "data": [', '\n  ]\n}', ']\n}'
+            else:
+                header = json.dumps(session_info, separators=(',', ':'))
+                point_tmpl = JSON_POINT_TMPL
+                data_open, data_close, empty_close = ',"data":[', ']}', ']}'
+            
+            points = (
+                (point_tmpl % (
+                    iso_time,
+                    power,
+                    _json_number(cadence),
+                    _json_number(speed),
+                )).encode()
+                for iso_time, (power, cadence, speed)
+                in zip(iso_times, map(_power_fields, session.power_data))
+            )
+            
+            with self._open_export(filepath, self.compress) as f:
+                # Reopen the session object to append the "data" array
+                f.write(header[:header.rindex('}')].rstrip().encode())
+                f.write(data_open.encode())
+                first = next(points, None)
+                if first is None:
+                    f.write(empty_close.encode())
+                else:
+                    f.write(first)
+                    f.writelines(b',' + point for point in points)
+                    f.write(data_close.encode())
+            
+            logger.info(f"Exported JSON to {filepath}")
+            return filepath
+            
+        except Exception as e:
+            logger.error(f"Error exporting JSON: {e}")
+            return None
+    
+    def export_csv(self, session, iso_times: Optional[List[str]] = None,
+                   timestamp: Optional[str] = None) -> Path:
+        """Export session data as CSV"""
+        try:
+            timestamp = timestamp or datetime.now().strftime(FILENAME_TIME_FORMAT)
+            filename = f"session_{session.session_id}_{timestamp}.csv{self._compressed_suffix}"
+            filepath = self.export_dir / filename
+            if iso_times is None:
+                iso_times = _iso_times(session)
+            
+            # Every field is a number or an ISO timestamp, so nothing needs
+            # quoting and the rows can be joined directly. Lines end in \r\n
+            # to match the csv module's default dialect.
+            rows = "".join(
+                f"{iso_time},{power},{cadence or ''},{speed or ''}\r\n"
+                for iso_time, (power, cadence, speed)
+                in zip(iso_times, map(_power_fields, session.power_data))
+            )
+            
+            with self._open_export(filepath, self.compress) as f:
+                f.write(CSV_HEADER)
+                f.write(rows.encode())
+            
+            logger.info(f"Exported CSV to {filepath}")
+            return filepath
+            
+        except Exception as e:
+            logger.error(f"Error exporting CSV: {e}")
+            return None
+    
+    def export_tcx(self, session, iso_times: Optional[List[str]] = None,
+                   timestamp: Optional[str] = None) -> Path:
+        """Export session data as TCX (Training Center XML)"""
+        try:
+            timestamp = timestamp or datetime.now().strftime(FILENAME_TIME_FORMAT)
+            filename = f"session_{session.session_id}_{timestamp}.tcx{self._compressed_suffix}"
+            filepath = self.export_dir / filename
+            if iso_times is None:
+                iso_times = _iso_times(session)
+            
+            start_iso = session.start_time.isoformat() if session.start_time else datetime.now().isoformat()
+            
+            # Basic TCX structure
+            tcx_content = TCX_HEADER_TMPL.format(start_iso=start_iso, duration=session.duration_seconds)
+            
+            # Track points are streamed into the file rather than appended to
+            # tcx_content, which would copy the whole document on every point
+            trackpoints = (
+                (TCX_TRACKPOINT_TMPL % (
+                    iso_time,
+                    cadence or 0,
+                    speed or 0,
+                    power,
+                )).encode()
+                for iso_time, (power, cadence, speed)
+                in zip(iso_times, map(_power_fields, session.power_data))
+            )
+            
+            with self._open_export(filepath, self.compress) as f:
+                f.write(tcx_content.encode())
+                f.writelines(trackpoints)
+                f.write(TCX_FOOTER)
+            
+            logger.info(f"Exported TCX to {filepath}")
+            return filepath
+            
+        except Exception as e:
+            logger.error(f"Error exporting TCX: {e}")
+            return None
+    
+    def export_fit(self, session, timestamp: Optional[str] = None) -> Path:
+        """Export session data as FIT file"""
+        try:
+            timestamp = timestamp or datetime.now().strftime(FILENAME_TIME_FORMAT)
+            filename = f"session_{session.session_id}_{timestamp}.fit"
+            filepath = self.export_dir / filename
+            
+            if FIT_AVAILABLE:
+                fit_data = self._encode_fit(session)
+                with self._open_export(filepath) as f:
+                    f.write(fit_data)
+            else:
+                self._write_fit_text(session, filepath)
             
             logger.info(f"Exported FIT to {filepath}")
             return filepath
@@ -427,3 +569,123 @@ total_data_points={len(session.power_data)}
         except Exception as e:
             logger.error(f"Error exporting FIT: {e}")
             return None
+    
+    def _encode_fit(self, session) -> bytes:
+        """Encode session data as a binary FIT activity file"""
+        mesg_num = Profile['mesg_num']
+        start_time = _fit_time(session.start_time or datetime.now())
+        end_time = _fit_time(session.end_time or datetime.now())
+        duration = session.duration_seconds
+        
+        encoder = Encoder()
+        encoder.on_mesg(mesg_num['FILE_ID'], {
+            'type': 'activity',
+            'manufacturer': 'development',
+            'product': 0,
+            'serial_number': 12345,
+            'time_created': start_time,
+        })
+        
+        record_num = mesg_num['RECORD']
+        for data_point in session.power_data:
+            record = {'timestamp': _fit_time(data_point.timestamp), 'power': data_point.instantaneous_power}
+            if data_point.cadence is not None:
+                record['cadence'] = data_point.cadence
+            if data_point.speed is not None:
+                record['speed'] = data_point.speed / 3.6  # FIT speed is m/s
+            if data_point.distance is not None:
+                record['distance'] = data_point.distance
+            encoder.on_mesg(record_num, record)
+        
+        summary = {
+            'timestamp': end_time,
+            'start_time': start_time,
+            'total_elapsed_time': duration,
+            'total_timer_time': duration,
+        }
+        if session.power_data:
+            avg_power, max_power, avg_cadence, max_cadence, avg_speed, max_speed = \
+                _summary_stats(session.power_data)
+            summary.update(
+                avg_power=round(avg_power),
+                max_power=max_power,
+                avg_cadence=round(avg_cadence),
+                max_cadence=max_cadence,
+                avg_speed=avg_speed / 3.6,
+                max_speed=max_speed / 3.6,
+            )
+        
+        encoder.on_mesg(mesg_num['LAP'], dict(summary, event='lap', event_type='stop'))
+        encoder.on_mesg(mesg_num['SESSION'], dict(
+            summary,
+            event='session',
+            event_type='stop',
+            sport='cycling',
+            sub_sport='indoor_cycling',
+            first_lap_index=0,
+            num_laps=1,
+        ))
+        encoder.on_mesg(mesg_num['ACTIVITY'], {
+            'timestamp': end_time,
+            'total_timer_time': duration,
+            'num_sessions': 1,
+            'type': 'manual',
+            'event': 'activity',
+            'event_type': 'stop',
+        })
+        return encoder.close()
+    
+    def _write_fit_text(self, session, filepath: Path):
+        """Write session data as a readable text FIT file, used without garmin-fit-sdk"""
+        # duration_seconds reads the clock while the session is running, so
+        # take it once to keep every section consistent
+        duration = session.duration_seconds
+        now_epoch = int(datetime.now().timestamp())
+        start_epoch = int(session.start_time.timestamp()) if session.start_time else now_epoch
+        end_epoch = int(session.end_time.timestamp()) if session.end_time else now_epoch
+        data_points = len(session.power_data)
+        
+        fit_content = FIT_TEXT_HEADER_TMPL.format(
+            generated=datetime.now().isoformat(),
+            session_id=session.session_id,
+            start_iso=session.start_time.isoformat() if session.start_time else 'Unknown',
+            end_iso=session.end_time.isoformat() if session.end_time else 'Unknown',
+            duration=duration,
+            data_points=data_points,
+            data_size=data_points * 4,
+            start_epoch=start_epoch,
+            end_epoch=end_epoch,
+        )
+        
+        # Power data points are streamed into the file below; heart rate
+        # is not available in the current data model
+        records = (
+            (FIT_RECORD_TMPL % (
+                point_time.timestamp(),
+                power,
+                cadence or 0,
+                speed or 0,
+            )).encode()
+            for point_time, power, cadence, speed in map(_timed_power_fields, session.power_data)
+        )
+        
+        # Add summary statistics
+        fit_summary = ""
+        if data_points:
+            avg_power, max_power, avg_cadence, max_cadence, avg_speed, max_speed = \
+                _summary_stats(session.power_data)
+            
+            fit_summary = FIT_SUMMARY_TMPL.format(
+                avg_power=avg_power,
+                max_power=max_power,
+                avg_cadence=avg_cadence,
+                max_cadence=max_cadence,
+                avg_speed=avg_speed,
+                max_speed=max_speed,
+                data_points=data_points,
+            )
+        
+        with self._open_export(filepath) as f:
+            f.write(fit_content.encode())
+            f.writelines(records)
+            f.write(fit_summary.encode())
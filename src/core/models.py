@@ -1,11 +1,14 @@
 """
 Data models for training sessions and device data
 """
-from dataclasses import dataclass
+import copy
+from dataclasses import dataclass, field, fields
 from datetime import datetime
 from typing import Optional, List
 from enum import Enum
 
+import numpy as np
+
 
 class DeviceType(Enum):
     SMART_TRAINER = "smart_trainer"
@@ -14,6 +17,16 @@ class DeviceType(Enum):
     SPEED_CADENCE_SENSOR = "speed_cadence_sensor"
 
 
+def slotted(cls):
+    """Rebuild a dataclass with __slots__ (dataclass(slots=True) needs Python 3.10)"""
+    names = tuple(f.name for f in fields(cls))
+    namespace = {k: v for k, v in cls.__dict__.items() if k not in names}
+    namespace.pop('__dict__', None)
+    namespace.pop('__weakref__', None)
+    namespace['__slots__'] = names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
 class ConnectionStatus(Enum):
     DISCONNECTED = "disconnected"
     CONNECTING = "connecting"
@@ -21,6 +34,7 @@ class ConnectionStatus(Enum):
     ERROR = "error"
 
 
+@slotted
 @dataclass
 class DeviceInfo:
     """Information about a BLE device"""
@@ -33,6 +47,7 @@ class DeviceInfo:
     serial_number: Optional[str] = None
 
 
+@slotted
 @dataclass
 class PowerData:
     """Cycling power measurement data"""
@@ -44,6 +59,56 @@ class PowerData:
     distance: Optional[float] = None  # meters
 
 
+# Column layout of TrainingSession.power_array(); missing optional values are 0.
+# Speed is stored in 0.01 km/h like the FTMS wire format, cadence stays 16-bit
+# because out-of-range frames can decode to more than 255 RPM.
+POWER_DTYPE = np.dtype([
+    ('timestamp', 'M8[us]'),
+    ('instantaneous_power', '<i2'),
+    ('average_power', '<i2'),
+    ('cadence', '<u2'),
+    ('speed_chkmh', '<u2'),
+    ('distance', '<f8'),
+])
+
+# Column layout of TrainingSession.heart_rate_array()
+HEART_RATE_DTYPE = np.dtype([
+    ('timestamp', 'M8[us]'),
+    ('heart_rate', 'u1'),
+])
+
+
+# Initial row capacity of TrainingSession's power buffer; it doubles when full
+POWER_BUFFER_ROWS = 4096
+
+
+# Value ranges of the integer POWER_DTYPE columns
+INT16_MIN, INT16_MAX = -0x8000, 0x7FFF
+UINT16_MAX = 0xFFFF
+
+
+def _clip(value, low, high):
+    """Clamp value to [low, high]"""
+    return low if value < low else high if value > high else value
+
+
+def _power_row(p: 'PowerData') -> tuple:
+    """POWER_DTYPE row for a PowerData; glitch values (e.g. a wheel speed of
+    700 km/h) are clipped to the column's range instead of raising"""
+    return (p.timestamp,
+            _clip(p.instantaneous_power, INT16_MIN, INT16_MAX),
+            _clip(p.average_power or 0, INT16_MIN, INT16_MAX),
+            _clip(round(p.cadence or 0), 0, UINT16_MAX),
+            _clip(round((p.speed or 0.0) * 100), 0, UINT16_MAX),
+            p.distance or 0.0)
+
+
+def speed_kmh(power: np.ndarray) -> np.ndarray:
+    """Speed column of a power_array() in km/h"""
+    return power['speed_chkmh'] / 100.0
+
+
+@slotted
 @dataclass
 class HeartRateData:
     """Heart rate measurement data"""
@@ -66,12 +131,19 @@ class TrainingSession:
     avg_power: float = 0.0
     max_power: int = 0
     power_count: int = 0
+    # Columnar copy of power_data backing power_array(); rows are written as
+    # samples arrive through add_power_data()
+    _power_buffer: np.ndarray = field(default=None, init=False, repr=False, compare=False)
+    _power_rows: int = field(default=0, init=False, repr=False, compare=False)
+    # Running sum behind avg_power, kept by add_power_data()
+    power_sum: int = field(default=0, init=False, repr=False, compare=False)
     
     def __post_init__(self):
         if self.power_data is None:
             self.power_data = []
         if self.heart_rate_data is None:
             self.heart_rate_data = []
+        self._power_buffer = np.empty(0, dtype=POWER_DTYPE)
     
     @property
     def duration_seconds(self) -> float:
@@ -85,3 +157,66 @@ class TrainingSession:
     def data_points(self) -> List[PowerData]:
         """Get all power data points"""
         return self.power_data
+    
+    def snapshot(self) -> 'TrainingSession':
+        """Copy of the session as it is now, for work on another thread while
+        samples keep arriving; the sample objects themselves are shared"""
+        session = copy.copy(self)
+        session.power_data = list(self.power_data)
+        session.heart_rate_data = list(self.heart_rate_data)
+        return session
+    
+    def add_power_data(self, power: PowerData):
+        """Append a power sample, updating the running power stats and the columnar buffer"""
+        watts = power.instantaneous_power
+        self.power_sum += watts
+        self.power_count += 1
+        self.avg_power = self.power_sum / self.power_count
+        if watts > self.max_power:
+            self.max_power = watts
+        
+        rows = self._power_rows
+        if rows != len(self.power_data):
+            # power_data was changed directly; power_array() rebuilds the buffer
+            self.power_data.append(power)
+            return
+        if rows == len(self._power_buffer):
+            grown = np.empty(max(2 * rows, POWER_BUFFER_ROWS), dtype=POWER_DTYPE)
+            grown[:rows] = self._power_buffer[:rows]
+            self._power_buffer = grown
+        # Buffer row first, so a sample the buffer rejects doesn't end up in
+        # power_data where every power_array() rebuild would trip over it
+        self._power_buffer[rows] = _power_row(power)
+        self.power_data.append(power)
+        self._power_rows = rows + 1
+    
+    def power_array(self) -> np.ndarray:
+        """Get power data as a structured array (one column per field) for bulk processing
+        
+        The result is a view of the session's buffer and must not be modified.
+        """
+        count = len(self.power_data)
+        if self._power_rows != count:
+            # Samples were appended to power_data directly; rebuild from the list
+            self._power_buffer = np.fromiter(
+                map(_power_row, self.power_data), dtype=POWER_DTYPE, count=count
+            )
+            self._power_rows = count
+        return self._power_buffer[:count]
+    
+    def distance_km(self) -> float:
+        """Distance covered in km, integrating speed over time with the trapezoid rule"""
+        power = self.power_array()
+        if len(power) < 2:
+            return 0.0
+        speed = speed_kmh(power)
+        micros = np.diff(power['timestamp']).astype(np.float64)
+        return float(np.dot(speed[1:] + speed[:-1], micros)) / 7.2e9  # km/h * us -> km, halved
+    
+    def heart_rate_array(self) -> np.ndarray:
+        """Get heart rate data as a structured array for bulk processing"""
+        return np.fromiter(
+            ((hr.timestamp, hr.heart_rate) for hr in self.heart_rate_data),
+            dtype=HEART_RATE_DTYPE,
+            count=len(self.heart_rate_data)
+        )
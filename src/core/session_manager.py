@@ -1,17 +1,254 @@
 """
 Session Management for Training Data
 """
+import atexit
+import functools
 import json
+import os
+import math
+import queue
+import struct
+import threading
+import time
 import uuid
-from datetime import datetime
+from dataclasses import fields, is_dataclass
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional, List
+from typing import Any, BinaryIO, Callable, Dict, Optional, List, Tuple
 import logging
 
-from .models import TrainingSession, PowerData, HeartRateData, DeviceInfo
+from .models import TrainingSession, PowerData, HeartRateData, DeviceInfo, DeviceType
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# Autosave log layout: a length-prefixed JSON header with the session id,
+# start time and device info, followed by fixed-width little-endian records.
+# Power: kind, timestamp (us since epoch), power, average power, cadence,
+# speed, distance. Heart rate: kind, timestamp, heart rate, RR count, then
+# that many RR intervals. None is stored as the sentinels below.
+LOG_HEADER = struct.Struct('<I')
+LOG_POWER_RECORD = struct.Struct('<cqhhHdd')
+LOG_HEART_RATE_RECORD = struct.Struct('<cqHB')
+LOG_RR_INTERVAL = struct.Struct('<H')
+LOG_POWER_KIND = b'P'
+LOG_HEART_RATE_KIND = b'H'
+LOG_NO_INT16 = -0x8000
+LOG_NO_UINT16 = 0xFFFF
+LOG_FLUSH_INTERVAL = 5.0  # seconds between autosave log flushes
+# Records are batched in the file buffer and reach the OS in one write per
+# this many power samples, or at the timed flush if that comes first
+LOG_BATCH_RECORDS = 256
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def _json_default(obj: Any) -> Any:
+    """Encode the types orjson handles natively for the stdlib json fallback"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if is_dataclass(obj):
+        return {f.name: getattr(obj, f.name) for f in fields(obj)}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dump_json(data: Any) -> bytes:
+    """Serialize session data to indented JSON, with orjson when available"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2, default=_json_default).encode()
+
+
+def write_atomic(filepath: Path, payload: bytes, sync: bool = False):
+    """Replace filepath with payload via a temp file so readers never see a partial write
+
+    With sync the data is fsynced before the rename; interim saves can skip it.
+    """
+    tmp_path = filepath.with_name(filepath.name + '.tmp')
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+
+
+# Session files are written by one background thread shared by every
+# SessionManager, so saving never blocks the caller on disk I/O. It starts with
+# the first queued write; flush_writes() waits for it and runs at exit.
+_writer_queue: "queue.Queue[Tuple[Path, bytes, bool, Optional[Callable[[], None]]]]" = queue.Queue()
+_writer_thread: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
+
+
+def _write_queued(filepath: Path, payload: bytes, sync: bool,
+                  on_written: Optional[Callable[[], None]]):
+    """Write one queued session file"""
+    try:
+        write_atomic(filepath, payload, sync)
+        logger.info(f"Saved session to {filepath}")
+        if on_written is not None:
+            on_written()
+    except Exception as e:
+        logger.error(f"Failed to save session: {e}")
+
+
+def _writer_loop():
+    """Write queued session files until the process exits"""
+    while True:
+        # Unpacked in the call, so nothing from the last write (payload, the
+        # manager behind on_written) stays referenced while the queue is idle
+        _write_queued(*_writer_queue.get())
+        _writer_queue.task_done()
+
+
+def queue_write(filepath: Path, payload: bytes, sync: bool = False,
+                on_written: Optional[Callable[[], None]] = None):
+    """Write payload to filepath on the writer thread, then call on_written there"""
+    global _writer_thread
+    with _writer_lock:
+        if _writer_thread is None:
+            _writer_thread = threading.Thread(target=_writer_loop, name="SessionWriter", daemon=True)
+            _writer_thread.start()
+            atexit.register(flush_writes)
+    _writer_queue.put((filepath, payload, sync, on_written))
+
+
+def flush_writes():
+    """Block until every queued session file has been written"""
+    _writer_queue.join()
+
+
+def load_json(data: bytes) -> Any:
+    """Parse JSON written by dump_json"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _device_info_to_dict(device_info: Optional[DeviceInfo]) -> Optional[Dict[str, Any]]:
+    """Convert device info to its saved form"""
+    if not device_info:
+        return None
+    return {
+        'address': device_info.address,
+        'name': device_info.name,
+        'device_type': device_info.device_type.value if device_info.device_type else None,
+        'manufacturer': device_info.manufacturer,
+        'model': device_info.model
+    }
+
+
+def _device_info_from_dict(di: Optional[Dict[str, Any]]) -> Optional[DeviceInfo]:
+    """Rebuild device info from its saved form"""
+    if not di:
+        return None
+    return DeviceInfo(
+        address=di['address'],
+        name=di['name'],
+        device_type=DeviceType(di['device_type']) if di['device_type'] else None,
+        manufacturer=di.get('manufacturer'),
+        model=di.get('model')
+    )
+
+
+def _to_micros(timestamp: datetime) -> int:
+    return (timestamp - _EPOCH) // _ONE_MICROSECOND
+
+
+def _from_micros(micros: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=micros)
+
+
+def _pack_power_record(data: PowerData) -> bytes:
+    return LOG_POWER_RECORD.pack(
+        LOG_POWER_KIND,
+        _to_micros(data.timestamp),
+        data.instantaneous_power,
+        LOG_NO_INT16 if data.average_power is None else data.average_power,
+        LOG_NO_UINT16 if data.cadence is None else data.cadence,
+        math.nan if data.speed is None else data.speed,
+        math.nan if data.distance is None else data.distance
+    )
+
+
+def _pack_heart_rate_record(data: HeartRateData) -> bytes:
+    rr_intervals = data.rr_intervals or []
+    record = LOG_HEART_RATE_RECORD.pack(
+        LOG_HEART_RATE_KIND,
+        _to_micros(data.timestamp),
+        data.heart_rate,
+        len(rr_intervals)
+    )
+    return record + b''.join(LOG_RR_INTERVAL.pack(rr) for rr in rr_intervals)
+
+
+def read_session_log(data: bytes) -> TrainingSession:
+    """Rebuild a session from an autosave log
+
+    A truncated record at the end, as left by a crash mid-write, is ignored.
+    """
+    (header_size,) = LOG_HEADER.unpack_from(data, 0)
+    offset = LOG_HEADER.size + header_size
+    if offset > len(data):
+        raise ValueError("Truncated autosave log header")
+    header = load_json(data[LOG_HEADER.size:offset])
+    session = TrainingSession(
+        session_id=header['session_id'],
+        start_time=datetime.fromisoformat(header['start_time']),
+        device_info=_device_info_from_dict(header.get('device_info'))
+    )
+    
+    end = len(data)
+    while offset < end:
+        kind = data[offset:offset + 1]
+        if kind == LOG_POWER_KIND:
+            if offset + LOG_POWER_RECORD.size > end:
+                break
+            _, micros, power, average_power, cadence, speed, distance = \
+                LOG_POWER_RECORD.unpack_from(data, offset)
+            offset += LOG_POWER_RECORD.size
+            session.add_power_data(PowerData(
+                timestamp=_from_micros(micros),
+                instantaneous_power=power,
+                average_power=None if average_power == LOG_NO_INT16 else average_power,
+                cadence=None if cadence == LOG_NO_UINT16 else cadence,
+                speed=None if math.isnan(speed) else speed,
+                distance=None if math.isnan(distance) else distance
+            ))
+        elif kind == LOG_HEART_RATE_KIND:
+            if offset + LOG_HEART_RATE_RECORD.size > end:
+                break
+            _, micros, heart_rate, rr_count = LOG_HEART_RATE_RECORD.unpack_from(data, offset)
+            record_end = offset + LOG_HEART_RATE_RECORD.size + rr_count * LOG_RR_INTERVAL.size
+            if record_end > end:
+                break
+            rr_intervals = [
+                rr for (rr,) in LOG_RR_INTERVAL.iter_unpack(
+                    data[offset + LOG_HEART_RATE_RECORD.size:record_end])
+            ]
+            offset = record_end
+            session.heart_rate_data.append(HeartRateData(
+                timestamp=_from_micros(micros),
+                heart_rate=heart_rate,
+                rr_intervals=rr_intervals or None
+            ))
+        else:
+            break
+    return session
+
+
 class SessionManager:
     """Manages training sessions and data persistence"""
     
@@ -20,6 +257,28 @@ class SessionManager:
         self.data_dir.mkdir(exist_ok=True)
         self.current_session: Optional[TrainingSession] = None
         
+        # Samples of the current session are appended to an autosave log so
+        # a crash loses at most the last few seconds; see recover_sessions()
+        self._log_file: Optional[BinaryIO] = None
+        self._log_flushed_at = 0.0
+        
+        # IDs of the saved sessions (dict as an ordered set), read from the
+        # directory on first use and then kept up to date as files are
+        # written and deleted by this manager
+        self._session_index: Optional[Dict[str, None]] = None
+    
+    def _session_written(self, filepath: Path, log_path: Optional[Path]):
+        """Called on the writer thread once a session file is saved; a log
+        path queued with the save is removed now that it is redundant"""
+        if self._session_index is not None:
+            self._session_index[filepath.stem] = None
+        if log_path is not None:
+            log_path.unlink(missing_ok=True)
+    
+    def flush(self):
+        """Block until every queued session save has been written"""
+        flush_writes()
+        
     def start_session(self, device_info: DeviceInfo) -> TrainingSession:
         """Start a new training session"""
         session_id = str(uuid.uuid4())
@@ -28,9 +287,52 @@ class SessionManager:
             start_time=datetime.now(),
             device_info=device_info
         )
+        self._open_log(self.current_session)
         logger.info(f"Started training session: {session_id}")
         return self.current_session
     
+    def _log_path(self, session_id: str) -> Path:
+        return self.data_dir / f"{session_id}.log"
+    
+    def _open_log(self, session: TrainingSession):
+        """Start the autosave log for a session with its header"""
+        self._close_log()
+        header = dump_json({
+            'session_id': session.session_id,
+            'start_time': session.start_time,
+            'device_info': _device_info_to_dict(session.device_info)
+        })
+        try:
+            self._log_file = open(self._log_path(session.session_id), 'ab',
+                                  buffering=LOG_BATCH_RECORDS * LOG_POWER_RECORD.size)
+            self._log_file.write(LOG_HEADER.pack(len(header)) + header)
+            self._log_file.flush()
+            self._log_flushed_at = time.monotonic()
+        except OSError as e:
+            logger.error(f"Failed to open autosave log: {e}")
+            self._close_log()
+    
+    def _close_log(self):
+        if self._log_file is None:
+            return
+        try:
+            self._log_file.close()
+        except OSError as e:
+            logger.error(f"Failed to close autosave log: {e}")
+        self._log_file = None
+    
+    def _append_log(self, record: bytes):
+        """Append a record to the autosave log, flushing every few seconds"""
+        try:
+            self._log_file.write(record)
+            now = time.monotonic()
+            if now - self._log_flushed_at >= LOG_FLUSH_INTERVAL:
+                self._log_file.flush()
+                self._log_flushed_at = now
+        except OSError as e:
+            logger.error(f"Autosave log write failed, disabling autosave: {e}")
+            self._close_log()
+    
     def end_session(self) -> Optional[TrainingSession]:
         """End the current training session"""
         if not self.current_session:
@@ -40,17 +342,19 @@ class SessionManager:
         self.current_session.end_time = datetime.now()
         duration = (self.current_session.end_time - self.current_session.start_time).total_seconds()
         
-        # Calculate totals
-        if self.current_session.power_data:
-            total_power = sum(p.instantaneous_power for p in self.current_session.power_data)
-            avg_power = total_power / len(self.current_session.power_data) if self.current_session.power_data else 0
-            self.current_session.total_energy = (total_power * duration) / 3600  # kJ
+        # Power totals are kept up to date by add_power_data
+        if self.current_session.power_count:
+            self.current_session.total_energy = (self.current_session.power_sum * duration) / 3600  # kJ
+        self.current_session.total_distance = self.current_session.distance_km()
             
         logger.info(f"Ended training session: {self.current_session.session_id}")
         logger.info(f"Duration: {duration:.1f}s, Data points: {len(self.current_session.power_data)}")
         
-        # Save session
-        self.save_session(self.current_session)
+        # Save session; this is the final write, so make it durable. The
+        # autosave log is removed only once the JSON file is on disk.
+        self._close_log()
+        self.save_session(self.current_session, sync=True,
+                          log_path=self._log_path(self.current_session.session_id))
         
         completed_session = self.current_session
         self.current_session = None
@@ -62,16 +366,12 @@ class SessionManager:
             logger.warning("No active session to add power data to")
             return
             
-        self.current_session.power_data.append(power_data)
-        
-        # Update distance if speed is available
-        if power_data.speed and self.current_session.power_data:
-            # Simple distance calculation (would need more sophisticated integration in real app)
-            if len(self.current_session.power_data) > 1:
-                prev_data = self.current_session.power_data[-2]
-                time_diff = (power_data.timestamp - prev_data.timestamp).total_seconds()
-                distance_increment = (power_data.speed * time_diff) / 3600  # km
-                self.current_session.total_distance += distance_increment
+        self.current_session.add_power_data(power_data)
+        if self._log_file is not None:
+            try:
+                self._append_log(_pack_power_record(power_data))
+            except struct.error as e:
+                logger.warning(f"Power sample not autosaved: {e}")
     
     def add_heart_rate_data(self, hr_data: HeartRateData):
         """Add heart rate data to current session"""
@@ -80,55 +380,46 @@ class SessionManager:
             return
             
         self.current_session.heart_rate_data.append(hr_data)
+        if self._log_file is not None:
+            try:
+                self._append_log(_pack_heart_rate_record(hr_data))
+            except struct.error as e:
+                logger.warning(f"Heart rate sample not autosaved: {e}")
     
-    def save_session(self, session: TrainingSession):
-        """Save session to file"""
+    def save_session(self, session: TrainingSession, sync: bool = False,
+                     log_path: Optional[Path] = None):
+        """Queue the session to be saved to file, fsynced if sync is set
+
+        If log_path is given, that autosave log is deleted after the save.
+        """
         filename = f"{session.session_id}.json"
         filepath = self.data_dir / filename
         
         try:
+            # Datetimes and the data point dataclasses are serialized as-is;
+            # their fields map one to one onto the saved keys
             session_data = {
                 'session_id': session.session_id,
-                'start_time': session.start_time.isoformat(),
-                'end_time': session.end_time.isoformat() if session.end_time else None,
-                'device_info': {
-                    'address': session.device_info.address,
-                    'name': session.device_info.name,
-                    'device_type': session.device_info.device_type.value if session.device_info.device_type else None,
-                    'manufacturer': session.device_info.manufacturer,
-                    'model': session.device_info.model
-                } if session.device_info else None,
-                'power_data': [
-                    {
-                        'timestamp': pd.timestamp.isoformat(),
-                        'instantaneous_power': pd.instantaneous_power,
-                        'average_power': pd.average_power,
-                        'cadence': pd.cadence,
-                        'speed': pd.speed,
-                        'distance': pd.distance
-                    } for pd in session.power_data
-                ],
-                'heart_rate_data': [
-                    {
-                        'timestamp': hr.timestamp.isoformat(),
-                        'heart_rate': hr.heart_rate,
-                        'rr_intervals': hr.rr_intervals
-                    } for hr in session.heart_rate_data
-                ],
+                'start_time': session.start_time,
+                'end_time': session.end_time,
+                'device_info': _device_info_to_dict(session.device_info),
+                'power_data': session.power_data,
+                'heart_rate_data': session.heart_rate_data,
                 'total_distance': session.total_distance,
                 'total_energy': session.total_energy
             }
             
-            with open(filepath, 'w') as f:
-                json.dump(session_data, f, indent=2)
-                
-            logger.info(f"Saved session to {filepath}")
+            # Encode now so later changes to the session don't leak into
+            # the file; the write itself happens on the writer thread
+            queue_write(filepath, dump_json(session_data), sync,
+                        functools.partial(self._session_written, filepath, log_path))
             
         except Exception as e:
             logger.error(f"Failed to save session: {e}")
     
     def load_session(self, session_id: str) -> Optional[TrainingSession]:
         """Load session from file"""
+        self.flush()
         filename = f"{session_id}.json"
         filepath = self.data_dir / filename
         
@@ -137,41 +428,32 @@ class SessionManager:
             return None
             
         try:
-            with open(filepath, 'r') as f:
-                session_data = json.load(f)
+            with open(filepath, 'rb') as f:
+                session_data = load_json(f.read())
             
             # Parse device info
-            device_info = None
-            if session_data.get('device_info'):
-                di = session_data['device_info']
-                device_info = DeviceInfo(
-                    address=di['address'],
-                    name=di['name'],
-                    device_type=DeviceType(di['device_type']) if di['device_type'] else None,
-                    manufacturer=di.get('manufacturer'),
-                    model=di.get('model')
-                )
+            device_info = _device_info_from_dict(session_data.get('device_info'))
             
             # Parse power data
-            power_data = []
-            for pd in session_data.get('power_data', []):
-                power_data.append(PowerData(
+            power_data = [
+                PowerData(
                     timestamp=datetime.fromisoformat(pd['timestamp']),
                     instantaneous_power=pd['instantaneous_power'],
                     average_power=pd.get('average_power'),
                     cadence=pd.get('cadence'),
                     speed=pd.get('speed'),
                     distance=pd.get('distance')
-                ))
+                ) for pd in session_data.get('power_data', [])
+            ]
             
             # Parse heart rate data
-            heart_rate_data = []
-            for hr in session_data.get('heart_rate_data', []):
-                heart_rate_data.append(HeartRateData(
+            heart_rate_data = [
+                HeartRateData(
                     timestamp=datetime.fromisoformat(hr['timestamp']),
                     heart_rate=hr['heart_rate'],
                     rr_intervals=hr.get('rr_intervals')
-                ))
+                ) for hr in session_data.get('heart_rate_data', [])
+            ]
             
             # Create session
             session = TrainingSession(
@@ -192,19 +474,64 @@ class SessionManager:
             logger.error(f"Failed to load session: {e}")
             return None
     
+    def recover_sessions(self) -> List[str]:
+        """Save sessions left behind in autosave logs by a crash
+
+        Call this at startup, before any other process may be recording into
+        the same data directory. Returns the recovered session IDs.
+        """
+        recovered = []
+        current_id = self.current_session.session_id if self.current_session else None
+        for log_path in self.data_dir.glob("*.log"):
+            if log_path.stem == current_id:
+                continue
+            if log_path.with_suffix('.json').exists():
+                # The final save completed; only the log removal was lost
+                log_path.unlink()
+                continue
+            try:
+                session = read_session_log(log_path.read_bytes())
+            except Exception as e:
+                logger.error(f"Failed to recover session from {log_path}: {e}")
+                continue
+            
+            # The end of the session is the last sample that made it to disk
+            timestamps = [d.timestamp for d in session.power_data[-1:] + session.heart_rate_data[-1:]]
+            session.end_time = max(timestamps, default=session.start_time)
+            duration = (session.end_time - session.start_time).total_seconds()
+            if session.power_count:
+                session.total_energy = (session.power_sum * duration) / 3600  # kJ
+            session.total_distance = session.distance_km()
+            
+            self.save_session(session, sync=True, log_path=log_path)
+            recovered.append(session.session_id)
+            logger.info(f"Recovered session {session.session_id} from autosave log")
+        
+        self.flush()
+        return recovered
+    
     def list_sessions(self) -> List[str]:
         """List all available session IDs"""
-        session_files = list(self.data_dir.glob("*.json"))
-        return [f.stem for f in session_files]
+        self.flush()
+        if self._session_index is None:
+            with os.scandir(self.data_dir) as entries:
+                self._session_index = {
+                    entry.name[:-5]: None for entry in entries
+                    if entry.name.endswith(".json")
+                }
+        return list(self._session_index)
     
     def delete_session(self, session_id: str) -> bool:
         """Delete a session file"""
+        self.flush()
         filename = f"{session_id}.json"
         filepath = self.data_dir / filename
         
         try:
             if filepath.exists():
                 filepath.unlink()
+                if self._session_index is not None:
+                    self._session_index.pop(session_id, None)
                 logger.info(f"Deleted session: {session_id}")
                 return True
             else:
@@ -1,13 +1,31 @@
 """
 Workout management and execution
 """
-from dataclasses import dataclass
+import json
+import time
+from dataclasses import dataclass, field, fields, is_dataclass
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from enum import Enum
 from loguru import logger
 
-from .models import PowerData, TrainingSession
+from .models import PowerData, TrainingSession, slotted
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _json_default(obj: Any) -> Any:
+    """Encode what orjson handles natively for the stdlib json fallback"""
+    if isinstance(obj, Enum):
+        return obj.value
+    if is_dataclass(obj):
+        # Like orjson, leave out private fields such as caches
+        return {f.name: getattr(obj, f.name) for f in fields(obj) if not f.name.startswith('_')}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
 
 class WorkoutType(Enum):
@@ -18,6 +36,7 @@ class WorkoutType(Enum):
     CUSTOM = "custom"
 
 
+@slotted
 @dataclass
 class WorkoutInterval:
     """A single interval within a workout"""
@@ -32,6 +51,7 @@ class WorkoutInterval:
             self.description = f"{self.duration_seconds}s @ {self.target_power}W"
 
 
+@slotted
 @dataclass
 class Workout:
     """Complete workout definition"""
@@ -41,10 +61,26 @@ class Workout:
     intervals: List[WorkoutInterval]
     warmup_duration: int = 300  # 5 minutes default
     cooldown_duration: int = 300  # 5 minutes default
+    total_duration: int = field(default=0, init=False)  # seconds, set from the above
+    _json_cache: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
     
     def __post_init__(self):
         self.total_duration = sum(interval.duration_seconds + interval.rest_seconds for interval in self.intervals)
         self.total_duration += self.warmup_duration + self.cooldown_duration
+        # init=False defaults aren't applied by __init__ under slots
+        self._json_cache = None
+    
+    def to_json_bytes(self) -> bytes:
+        """Get the workout as compact JSON, serialized once and then cached
+
+        The workout must not be modified after the first call.
+        """
+        if self._json_cache is None:
+            if ORJSON_AVAILABLE:
+                self._json_cache = orjson.dumps(self)
+            else:
+                self._json_cache = json.dumps(self, default=_json_default, separators=(',', ':')).encode()
+        return self._json_cache
 
 
 class WorkoutExecutor:
@@ -56,11 +92,31 @@ class WorkoutExecutor:
         self.interval_start_time: Optional[datetime] = None
         self.workout_start_time: Optional[datetime] = None
         self.phase: str = "idle"  # idle, warmup, interval, rest, cooldown
-        self.callbacks: List[callable] = []
+        # Registered callbacks and the immutable snapshot iterated on every
+        # event, so a callback may add or remove callbacks while it runs
+        self._callbacks: List[callable] = []
+        self.callbacks: Tuple[callable, ...] = ()
+        
+        # Set at each phase transition so update() doesn't have to look
+        # them up on every tick: the interval being ridden (or rested after)
+        # and the length of the current phase in seconds
+        self._interval: Optional[WorkoutInterval] = None
+        self._phase_duration: int = 0
+        # Monotonic twin of interval_start_time used for elapsed time
+        self._phase_start_monotonic: float = 0.0
+        # Filled in and returned by every update() rather than a new dict
+        self._guidance: Dict[str, Any] = {}
         
     def add_callback(self, callback: callable):
         """Add callback for workout events"""
-        self.callbacks.append(callback)
+        self._callbacks.append(callback)
+        self.callbacks = tuple(self._callbacks)
+        
+    def remove_callback(self, callback: callable):
+        """Remove a workout event callback"""
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+            self.callbacks = tuple(self._callbacks)
         
     def _notify_callbacks(self, event_type: str, data: Dict[str, Any]):
         """Notify all callbacks of workout events"""
@@ -77,6 +133,9 @@ class WorkoutExecutor:
         self.workout_start_time = datetime.now()
         self.phase = "warmup"
         self.interval_start_time = self.workout_start_time
+        self._phase_start_monotonic = time.monotonic()
+        self._interval = None
+        self._phase_duration = workout.warmup_duration
         
         logger.info(f"Started workout: {workout.name}")
         self._notify_callbacks("workout_started", {
@@ -86,35 +145,38 @@ class WorkoutExecutor:
         })
     
     def update(self, current_power: PowerData) -> Dict[str, Any]:
-        """Update workout state based on current power data"""
+        """Update workout state based on current power data
+
+        The returned guidance dict is reused by the next call; copy it to keep it.
+        """
         if not self.current_workout:
             return {}
             
-        now = datetime.now()
-        elapsed = (now - self.interval_start_time).total_seconds()
+        elapsed = time.monotonic() - self._phase_start_monotonic
+        remaining = self._phase_duration - elapsed
+        finished = remaining <= 0
         
-        guidance = {
-            "phase": self.phase,
-            "elapsed_time": elapsed,
-            "remaining_time": 0,
-            "target_power": 0,
-            "target_cadence": None,
-            "description": "",
-            "power_difference": 0,
-            "guidance": ""
-        }
+        guidance = self._guidance
+        guidance["phase"] = self.phase
+        guidance["elapsed_time"] = elapsed
+        guidance["remaining_time"] = 0
+        guidance["target_power"] = 0
+        guidance["target_cadence"] = None
+        guidance["description"] = ""
+        guidance["power_difference"] = 0
+        guidance["guidance"] = ""
         
         if self.phase == "warmup":
-            guidance["remaining_time"] = self.current_workout.warmup_duration - elapsed
+            guidance["remaining_time"] = remaining
             guidance["target_power"] = int(current_power.instantaneous_power * 0.5)  # 50% of current
             guidance["description"] = "Warmup"
             
-            if elapsed >= self.current_workout.warmup_duration:
+            if finished:
                 self._start_next_interval()
                 
         elif self.phase == "interval":
-            interval = self.current_workout.intervals[self.current_interval_index]
-            guidance["remaining_time"] = interval.duration_seconds - elapsed
+            interval = self._interval
+            guidance["remaining_time"] = remaining
             guidance["target_power"] = interval.target_power
             guidance["target_cadence"] = interval.target_cadence
             guidance["description"] = interval.description
@@ -128,24 +190,23 @@ class WorkoutExecutor:
             else:
                 guidance["guidance"] = "Good power!"
                 
-            if elapsed >= interval.duration_seconds:
+            if finished:
                 self._finish_interval()
                 
         elif self.phase == "rest":
-            interval = self.current_workout.intervals[self.current_interval_index - 1]
-            guidance["remaining_time"] = interval.rest_seconds - elapsed
+            guidance["remaining_time"] = remaining
             guidance["target_power"] = int(current_power.instantaneous_power * 0.3)  # 30% of current
             guidance["description"] = "Rest"
             
-            if elapsed >= interval.rest_seconds:
+            if finished:
                 self._start_next_interval()
                 
         elif self.phase == "cooldown":
-            guidance["remaining_time"] = self.current_workout.cooldown_duration - elapsed
+            guidance["remaining_time"] = remaining
             guidance["target_power"] = int(current_power.instantaneous_power * 0.4)  # 40% of current
             guidance["description"] = "Cooldown"
             
-            if elapsed >= self.current_workout.cooldown_duration:
+            if finished:
                 self._finish_workout()
         
         return guidance
@@ -155,7 +216,10 @@ class WorkoutExecutor:
         if self.current_interval_index < len(self.current_workout.intervals):
             self.phase = "interval"
             self.interval_start_time = datetime.now()
+            self._phase_start_monotonic = time.monotonic()
             interval = self.current_workout.intervals[self.current_interval_index]
+            self._interval = interval
+            self._phase_duration = interval.duration_seconds
             
             logger.info(f"Starting interval {self.current_interval_index + 1}: {interval.description}")
             self._notify_callbacks("interval_started", {
@@ -168,12 +232,14 @@ class WorkoutExecutor:
     
     def _finish_interval(self):
         """Finish current interval and start rest or next interval"""
-        interval = self.current_workout.intervals[self.current_interval_index]
+        interval = self._interval
         self.current_interval_index += 1
         
         if interval.rest_seconds > 0 and self.current_interval_index < len(self.current_workout.intervals):
             self.phase = "rest"
             self.interval_start_time = datetime.now()
+            self._phase_start_monotonic = time.monotonic()
+            self._phase_duration = interval.rest_seconds
             logger.info(f"Rest period: {interval.rest_seconds}s")
             self._notify_callbacks("rest_started", {
                 "rest_duration": interval.rest_seconds,
@@ -186,6 +252,9 @@ class WorkoutExecutor:
         """Start cooldown phase"""
         self.phase = "cooldown"
         self.interval_start_time = datetime.now()
+        self._phase_start_monotonic = time.monotonic()
+        self._interval = None
+        self._phase_duration = self.current_workout.cooldown_duration
         logger.info("Starting cooldown")
         self._notify_callbacks("cooldown_started", {
             "phase": self.phase,
@@ -208,6 +277,7 @@ class WorkoutExecutor:
         self.current_interval_index = 0
         self.workout_start_time = None
         self.interval_start_time = None
+        self._interval = None
     
     def stop_workout(self):
         """Stop the current workout"""
@@ -222,6 +292,7 @@ class WorkoutExecutor:
             self.current_interval_index = 0
             self.workout_start_time = None
             self.interval_start_time = None
+            self._interval = None
             self.phase = "idle"
 
 
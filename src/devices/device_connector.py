@@ -1,35 +1,83 @@
 import asyncio
-from bleak import BleakScanner, BleakClient
+import functools
+import logging
+import struct
+from bleak import BleakClient
 import platform  # To handle potential OS differences for cycling power
 
+# Try relative imports first, fall back to absolute
+try:
+    from .scan import scan_once
+except ImportError:
+    # Fallback to absolute imports when running as script
+    import sys
+    from pathlib import Path
+    sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+    from src.devices.scan import scan_once
+
+logger = logging.getLogger(__name__)
+
 #UUIDS for devices, might need to look up specific UUIDs later
 HEART_RATE_SERVICE_UUID = "0000180D-0000-1000-8000-00805f9b34fb"
 CYCLING_POWER_SERVICE_UUID = "00001818-0000-1000-8000-00805f9b34fb"
 CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID = "00002A63-0000-1000-8000-00805f9b34fb"
 
+# bleak reports characteristic UUIDs in lowercase
+_CPM_UUID = CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID.lower()
+# Power is a SINT16 after the 2-byte flags field; BLE is little-endian
+_POWER_STRUCT = struct.Struct('<h')
+
+# Notifications waiting to be parsed; the oldest are dropped when it fills up
+NOTIFICATION_QUEUE_SIZE = 1024
+
 
 def notification_handler(sender, data):
-    print(f"[{sender}]: {data.hex()}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"[{sender}]: {data.hex()}")
 
-    if sender == CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID:
+    # Newer bleak versions pass the characteristic, older ones its UUID
+    if getattr(sender, 'uuid', sender) == _CPM_UUID:
         if len(data) >= 4:
-            # Power is typically a SINT16, so two bytes.
-            # Byte order for BLE is usually Little-Endian.
-            instantaneous_power = int.from_bytes(data[2:4], byteorder='little', signed=True)
+            instantaneous_power = _POWER_STRUCT.unpack_from(data, 2)[0]
             print(f"  Instantaneous Power: {instantaneous_power} Watts")
         else:
             print("  Not enough data for power measurement.")
 
 
+def enqueue_notification(queue, sender, data):
+    """Hand a notification to consume_notifications without parsing it in bleak's callback"""
+    if queue.full():
+        # Keep the most recent samples rather than blocking bleak
+        queue.get_nowait()
+    queue.put_nowait((sender, bytes(data)))
+
+
+async def consume_notifications(queue):
+    """Parse queued notifications until cancelled"""
+    while True:
+        sender, data = await queue.get()
+        notification_handler(sender, data)
+
+
+def print_services(client):
+    """Print every service and characteristic the connected device offers"""
+    for service in client.services:
+        print(f"  Service: {service.uuid} ({service.description})")
+        for char in service.characteristics:
+            print(f"    Characteristic: {char.uuid} ({char.description}) - Props: {char.properties}")
+            if "notify" in char.properties:
+                print(f"      (Supports Notifications)")
+
+
 async def run_scanner_and_connect():
     print("Scanning for Bluetooth LE devices...")
 
-    # Scan for 5 seconds.
-    # devices = await BleakScanner.discover(timeout=5.0)
-    # The default discover() returns BLEDevice objects. For more detailed ad_data (including RSSI),
+    # Scan for 5 seconds, letting the scanner drop devices without the
+    # Cycling Power service.
+    # discover() returns BLEDevice objects. For more detailed ad_data (including RSSI),
     # it's better to use the callback or a different approach if you need RSSI directly from discovery.
     # For now, let's just get the BLEDevice objects and skip RSSI in the initial print.
-    devices = await BleakScanner.discover(timeout=5.0)
+    devices = await scan_once(timeout=5.0, service_uuids=[CYCLING_POWER_SERVICE_UUID])
 
     if not devices:
         print("No devices found.")
@@ -65,26 +113,32 @@ async def run_scanner_and_connect():
             if client.is_connected:
                 print(f"Successfully connected to {target_device.name}!")
 
-                print("\nDiscovering services and characteristics...")
-                for service in client.services:
-                    print(f"  Service: {service.uuid} ({service.description})")
-                    for char in service.characteristics:
-                        print(f"    Characteristic: {char.uuid} ({char.description}) - Props: {char.properties}")
-                        if "notify" in char.properties:
-                            print(f"      (Supports Notifications)")
-
-                            if char.uuid == CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID:
-                                print(f"\nSubscribing to Cycling Power Measurement ({char.uuid})...")
-                                try:
-                                    await client.start_notify(char.uuid, notification_handler)
-                                    print("Subscribed successfully! Waiting for data...")
-                                    # Listen for a longer duration for real usage
-                                    await asyncio.sleep(120)  # Listen for 2 minutes
-
-                                    print("\nUnsubscribing from Cycling Power Measurement...")
-                                    await client.stop_notify(char.uuid)
-                                except Exception as e:
-                                    print(f"Error subscribing or during notification: {e}")
+                # Look the characteristic up directly; the full service
+                # listing is only walked for debugging or when it's missing
+                char = client.services.get_characteristic(CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID)
+                if char is None:
+                    print("Cycling Power Measurement characteristic not found. Available services:")
+                    print_services(client)
+                else:
+                    if logger.isEnabledFor(logging.DEBUG):
+                        print("\nDiscovering services and characteristics...")
+                        print_services(client)
+
+                    print(f"\nSubscribing to Cycling Power Measurement ({char.uuid})...")
+                    queue = asyncio.Queue(maxsize=NOTIFICATION_QUEUE_SIZE)
+                    consumer = asyncio.create_task(consume_notifications(queue))
+                    try:
+                        await client.start_notify(char, functools.partial(enqueue_notification, queue))
+                        print("Subscribed successfully! Waiting for data...")
+                        # Listen for a longer duration for real usage
+                        await asyncio.sleep(120)  # Listen for 2 minutes
+
+                        print("\nUnsubscribing from Cycling Power Measurement...")
+                        await client.stop_notify(char)
+                    except Exception as e:
+                        print(f"Error subscribing or during notification: {e}")
+                    finally:
+                        consumer.cancel()
 
                 print("Disconnecting...")
             else:
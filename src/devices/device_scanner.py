@@ -1,9 +1,18 @@
 import asyncio
-from bleak import BleakScanner
+
+# Try relative imports first, fall back to absolute
+try:
+    from .scan import scan_once
+except ImportError:
+    # Fallback to absolute imports when running as script
+    import sys
+    from pathlib import Path
+    sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+    from src.devices.scan import scan_once
 
 async def run_scan():
     print("Scanning for Bluetooth LE devices...")
-    devices = await BleakScanner.discover()
+    devices = await scan_once()
     
     if not devices:
         print("No devices found.")
@@ -1,15 +1,23 @@
 import asyncio
-from bleak import BleakScanner
+
+# Try relative imports first, fall back to absolute
+try:
+    from .scan import scan_once
+    from ..core.constants import CYCLING_POWER_SERVICE_UUID
+except ImportError:
+    # Fallback to absolute imports when running as script
+    import sys
+    from pathlib import Path
+    sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+    from src.devices.scan import scan_once
+    from src.core.constants import CYCLING_POWER_SERVICE_UUID
 
 async def run_scan():
     print("Scanning for Bluetooth LE devices...")
     
-    # You can pass service UUIDs directly to discover for filtering, e.g.:
-    # CYCLING_POWER_SERVICE_UUID = "00001818-0000-1000-8000-00805f9b34fb" # Example
-    # devices = await BleakScanner.discover(service_uuids=[CYCLING_POWER_SERVICE_UUID])
-    
-    # Or scan all and filter by name/services later
-    devices = await BleakScanner.discover()
+    # Only devices advertising the Cycling Power service are reported;
+    # the scanner filters on it, the name check below picks the Kickrs
+    devices = await scan_once(service_uuids=[CYCLING_POWER_SERVICE_UUID])
     
     if not devices:
         print("No devices found.")
@@ -22,10 +30,6 @@ async def run_scan():
         if device.name and "kickr" in device.name.lower():
             print(f"  Found Smart Trainer: Address: {device.address}, Name: {device.name}")
             found_trainers.append(device)
-        # Or, filter by services if you know their UUIDs
-        # if CYCLING_POWER_SERVICE_UUID in device.metadata.get("uuids", []):
-        #    print(f"  Found Cycling Power Device: Address: {device.address}, Name: {device.name}")
-
 
     if not found_trainers:
         print("No smart trainers found by name filter.")
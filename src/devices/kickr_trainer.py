@@ -2,22 +2,25 @@
 Wahoo Kickr Smart Trainer Device Driver
 """
 import asyncio
+import bisect
+import functools
 import struct
 import math
-from datetime import datetime
-from typing import Optional, List, Callable, Any
-from bleak import BleakClient, BleakScanner
-from bleak.backends.device import BLEDevice
-from bleak.backends.scanner import AdvertisementData
+import time
+from typing import Optional, List, Callable, Any, Tuple, TYPE_CHECKING
 import logging
 
+import numpy as np
+
+if TYPE_CHECKING:
+    from bleak.backends.device import BLEDevice
+
 # Try relative imports first, fall back to absolute
 try:
     from ..core.base_device import BaseDevice
     from ..core.models import DeviceInfo, PowerData, DeviceType
     from ..core.constants import (
-        CYCLING_POWER_SERVICE_UUID, CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID,
-        FITNESS_MACHINE_SERVICE_UUID, INDOOR_BIKE_DATA_CHARACTERISTIC_UUID,
+        CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID, INDOOR_BIKE_DATA_CHARACTERISTIC_UUID,
         FITNESS_MACHINE_CONTROL_POINT_CHARACTERISTIC_UUID, FITNESS_MACHINE_FEATURE_CHARACTERISTIC_UUID
     )
 except ImportError:
@@ -28,21 +31,178 @@ except ImportError:
     from src.core.base_device import BaseDevice
     from src.core.models import DeviceInfo, PowerData, DeviceType
     from src.core.constants import (
-        CYCLING_POWER_SERVICE_UUID, CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID,
-        FITNESS_MACHINE_SERVICE_UUID, INDOOR_BIKE_DATA_CHARACTERISTIC_UUID,
+        CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID, INDOOR_BIKE_DATA_CHARACTERISTIC_UUID,
         FITNESS_MACHINE_CONTROL_POINT_CHARACTERISTIC_UUID, FITNESS_MACHINE_FEATURE_CHARACTERISTIC_UUID
     )
 
 logger = logging.getLogger(__name__)
 
+# Cycling Power Measurement header: flags (uint16), instantaneous power (sint16)
+CYCLING_POWER_HEADER = struct.Struct('<Hh')
+
+UINT16 = struct.Struct('<H')
+
+# Samples are logged at INFO at most this often, the rest at DEBUG
+SAMPLE_LOG_INTERVAL_NS = 1_000_000_000
+
+# Estimated cadence (RPM) indexed by power in watts, for trainers that don't
+# report it: 60 below 50 W, then 70/80/85 per 50 W band, 90 from 200 W up
+CADENCE_BY_POWER = bytes([0] + [60] * 49 + [70] * 50 + [80] * 50 + [85] * 50 + [90] * 56)
+
+GRAVITY = 9.8067  # m/s^2
+AIR_DENSITY = 1.225  # kg/m^3 (at sea level, 15C)
+
+# Optional Indoor Bike Data fields in frame order: (flag, name, struct format).
+# Names follow what the Kickr actually sends, which differs from the FTMS
+# spec: the "cadence" slot carries speed and the "power" slot cadence.
+INDOOR_BIKE_FIELDS = (
+    (0x0002, 'average_speed', 'H'),          # 0.01 km/h
+    (0x0004, 'instantaneous_speed', 'H'),    # 0.01 km/h
+    (0x0008, 'average_cadence', 'H'),        # 0.01 RPM
+    (0x0010, 'total_distance', '3s'),        # uint24, 1 meter
+    (0x0020, 'resistance_level', 'h'),       # 1 unit
+    (0x0040, 'instantaneous_cadence', 'H'),  # 0.5 RPM
+    (0x0080, 'average_power', 'h'),          # 1 watt
+    (0x0100, 'total_energy', 'H'),           # 1 kJ
+    (0x0200, 'energy_per_hour', 'H'),        # 1 kJ
+    (0x0400, 'energy_per_minute', 'B'),      # 1 kJ
+    (0x0800, 'heart_rate', 'B'),             # 1 BPM
+    (0x1000, 'metabolic_equivalent', 'B'),   # 0.1
+    (0x2000, 'elapsed_time', 'H'),           # 1 second
+    (0x4000, 'remaining_time', 'H'),         # 1 second
+)
+
+
+# Fields _parse_indoor_bike_data reads; the others are skipped as pad bytes
+INDOOR_BIKE_USED_FIELDS = frozenset({'instantaneous_speed', 'instantaneous_cadence', 'average_power'})
+
+
+class IndoorBikeLayout:
+    """Precompiled Indoor Bike Data parser for one value of the flags field"""
+    
+    def __init__(self, flags: int):
+        names = []
+        # Format of the frame up to the end of each used field, after the flags
+        prefixes = ['<2x']
+        fmt = '<2x'
+        for flag, name, field_fmt in INDOOR_BIKE_FIELDS:
+            if not flags & flag:
+                continue
+            if name in INDOOR_BIKE_USED_FIELDS:
+                fmt += field_fmt
+                names.append(name)
+                prefixes.append(fmt)
+            else:
+                fmt += '%dx' % struct.calcsize(field_fmt)
+        self.names = tuple(names)
+        # One Struct for the whole frame up to the last used field, plus one
+        # per used field count for frames cut short after a complete field
+        self.struct = struct.Struct(prefixes[-1])
+        self._partial = [struct.Struct(prefix) for prefix in prefixes[:-1]]
+        self._ends = [s.size for s in self._partial[1:]] + [self.struct.size]
+    
+    def unpack(self, data: bytearray) -> dict:
+        """Map the name of each present used field to its raw value (None if truncated)"""
+        if len(data) >= self.struct.size:
+            return dict(zip(self.names, self.struct.unpack_from(data)))
+        complete = bisect.bisect_right(self._ends, len(data))
+        values = self._partial[complete].unpack_from(data)
+        return dict(zip(self.names, values + (None,) * (len(self.names) - complete)))
+
+
+_indoor_bike_layouts = {}
+
+
+def _cbrt(x: float) -> float:
+    """Real cube root (math.cbrt needs Python 3.11)"""
+    return math.copysign(abs(x) ** (1 / 3), x)
+
+
+@functools.lru_cache(maxsize=None)
+def resisting_force(total_mass_kg: float, crr: float, gradient_percent: float) -> float:
+    """Rolling resistance plus gravity along the slope, in newtons"""
+    # Convert gradient to an angle
+    angle = math.atan(gradient_percent / 100.0)
+    frr = crr * total_mass_kg * GRAVITY * math.cos(angle)
+    fg = total_mass_kg * GRAVITY * math.sin(angle)
+    return frr + fg
+
+
+@functools.lru_cache(maxsize=2048)
+def power_based_speed(power_watts: int, rider_weight_kg: float, bike_weight_kg: float,
+                      crr: float, cda: float, gradient_percent: float) -> float:
+    """Speed in km/h for a power output; steady riding repeats the same inputs"""
+    if power_watts <= 0:
+        return 0.0
+
+    # Power balance P = base_force * v + drag * v^3 with the speed independent
+    # forces and the drag coefficient (air resistance fa = drag * v^2)
+    base_force = resisting_force(rider_weight_kg + bike_weight_kg, crr, gradient_percent)
+    drag = 0.5 * cda * AIR_DENSITY
+    if drag <= 0:
+        v_mps = power_watts / base_force if base_force > 0 else 0.0
+    else:
+        # Solve the depressed cubic v^3 + p*v + q = 0 in closed form
+        p = base_force / drag
+        q = -power_watts / drag
+        discriminant = q * q / 4 + p * p * p / 27
+        if discriminant >= 0:
+            # One real root (Cardano)
+            root = math.sqrt(discriminant)
+            v_mps = _cbrt(-q / 2 + root) + _cbrt(-q / 2 - root)
+        else:
+            # Steep descent: three real roots, take the largest
+            cos_3theta = 3 * q / (2 * p) * math.sqrt(-3 / p)
+            v_mps = 2 * math.sqrt(-p / 3) * math.cos(math.acos(max(-1.0, min(1.0, cos_3theta))) / 3)
+    
+    # Convert m/s to km/h
+    speed_kmh = v_mps * 3.6
+    return max(0.0, speed_kmh)
+
+
+def power_based_speed_batch(powers: np.ndarray, rider_weight_kg: float, bike_weight_kg: float,
+                            crr: float, cda: float, gradient_percent: float) -> np.ndarray:
+    """Speeds in km/h for an array of power outputs, as power_based_speed computes them"""
+    powers = np.asarray(powers, dtype=np.float64)
+    base_force = resisting_force(rider_weight_kg + bike_weight_kg, crr, gradient_percent)
+    drag = 0.5 * cda * AIR_DENSITY
+    if drag <= 0:
+        v_mps = powers / base_force if base_force > 0 else np.zeros_like(powers)
+    else:
+        p = base_force / drag
+        q = -powers / drag
+        discriminant = q * q / 4 + p * p * p / 27
+        v_mps = np.empty_like(q)
+        one_root = discriminant >= 0
+        half_q = q[one_root] / 2
+        root = np.sqrt(discriminant[one_root])
+        v_mps[one_root] = np.cbrt(-half_q + root) + np.cbrt(-half_q - root)
+        three_roots = ~one_root
+        if three_roots.any():
+            cos_3theta = 3 * q[three_roots] / (2 * p) * math.sqrt(-3 / p)
+            v_mps[three_roots] = 2 * math.sqrt(-p / 3) * np.cos(np.arccos(np.clip(cos_3theta, -1.0, 1.0)) / 3)
+    return np.where(powers > 0, np.maximum(v_mps * 3.6, 0.0), 0.0)
+
+
+def indoor_bike_layout(flags: int) -> IndoorBikeLayout:
+    """Get the parser for a flags value; a trainer sends the same few over and over"""
+    layout = _indoor_bike_layouts.get(flags)
+    if layout is None:
+        layout = _indoor_bike_layouts[flags] = IndoorBikeLayout(flags)
+    return layout
+
 class KickrTrainer(BaseDevice):
     """Wahoo Kickr Smart Trainer Device Driver"""
     
-    def __init__(self, device_info: DeviceInfo):
-        super().__init__(device_info)
+    def __init__(self, device_info: DeviceInfo, ble_device: Optional["BLEDevice"] = None):
+        super().__init__(device_info, ble_device)
         self.power_notification_active = False
         self.fitness_machine_notification_active = False
+        # Handles notifications were started on, stopped by _cleanup_notifications
+        self._indoor_bike_handle: Optional[int] = None
+        self._power_handle: Optional[int] = None
         self.data_count = 0
+        self._last_info_log_ns = 0
         
         # Power-based speed calculation parameters (default values)
         self.rider_weight_kg = 75.0
@@ -55,30 +215,13 @@ class KickrTrainer(BaseDevice):
         logger.info(f"Gradient set to {self.gradient_percent}%")
 
     @classmethod
-    async def scan_for_devices(cls, timeout: float = 10.0) -> List[DeviceInfo]:
-        """Scan for Kickr devices"""
+    async def scan_for_devices(cls, timeout: float = 10.0, count: Optional[int] = None) -> List[DeviceInfo]:
+        """Scan for Kickr devices for timeout seconds, or until count of them are found"""
         logger.info("Scanning for Kickr devices...")
-        
-        def detection_callback(device: BLEDevice, advertisement_data: AdvertisementData):
-            if device.name and "kickr" in device.name.lower():
-                logger.info(f"Found Kickr: {device.name} ({device.address})")
-        
-        devices = await BleakScanner.discover(timeout=timeout, detection_callback=detection_callback)
-        
-        kickr_devices = []
-        for device in devices:
-            if device.name and "kickr" in device.name.lower():
-                device_info = DeviceInfo(
-                    address=device.address,
-                    name=device.name,
-                    device_type=DeviceType.SMART_TRAINER
-                )
-                kickr_devices.append(device_info)
-        
-        return kickr_devices
+        return await super().scan_for_devices(timeout=timeout, count=count)
     
     @classmethod
-    def _create_device_info(cls, device: BLEDevice) -> Optional[DeviceInfo]:
+    def _create_device_info(cls, device: "BLEDevice") -> Optional[DeviceInfo]:
         """Create DeviceInfo from discovered device"""
         if device.name and "kickr" in device.name.lower():
             return DeviceInfo(
@@ -92,51 +235,41 @@ class KickrTrainer(BaseDevice):
         """Setup device-specific notifications"""
         try:
             logger.info("Setting up notifications...")
-            services = self.client.services
             
             # --- Fitness Machine Service (Primary) ---
-            fitness_machine_service = None
-            for service in services:
-                logger.debug(f"Service: {service.uuid}")
-                if service.uuid.lower() == FITNESS_MACHINE_SERVICE_UUID.lower():
-                    fitness_machine_service = service
-                    logger.info(f"Found Fitness Machine Service: {service.uuid}")
-                    break
+            indoor_bike_handle = self._char_handles.get(INDOOR_BIKE_DATA_CHARACTERISTIC_UUID)
+            control_point_handle = self._char_handles.get(FITNESS_MACHINE_CONTROL_POINT_CHARACTERISTIC_UUID)
+            feature_handle = self._char_handles.get(FITNESS_MACHINE_FEATURE_CHARACTERISTIC_UUID)
             
-            if fitness_machine_service:
-                # Find Indoor Bike Data Characteristic
-                indoor_bike_char = None
-                control_point_char = None
-                feature_char = None
+            if indoor_bike_handle is not None or control_point_handle is not None or feature_handle is not None:
+                logger.info("Found Fitness Machine Service")
                 
-                for char in fitness_machine_service.characteristics:
-                    logger.debug(f"Fitness Machine Characteristic: {char.uuid}")
-                    if char.uuid.lower() == INDOOR_BIKE_DATA_CHARACTERISTIC_UUID.lower():
-                        indoor_bike_char = char
-                        logger.info(f"Found Indoor Bike Data Characteristic: {char.uuid}")
-                    elif char.uuid.lower() == FITNESS_MACHINE_CONTROL_POINT_CHARACTERISTIC_UUID.lower():
-                        control_point_char = char
-                        logger.info(f"Found Fitness Machine Control Point Characteristic: {char.uuid}")
-                    elif char.uuid.lower() == FITNESS_MACHINE_FEATURE_CHARACTERISTIC_UUID.lower():
-                        feature_char = char
-                        logger.info(f"Found Fitness Machine Feature Characteristic: {char.uuid}")
-
-                if indoor_bike_char:
-                    await self.client.start_notify(indoor_bike_char, self._indoor_bike_notification_handler)
+                if indoor_bike_handle is not None:
+                    logger.info(f"Found Indoor Bike Data Characteristic (handle {indoor_bike_handle})")
+                    await self.client.start_notify(indoor_bike_handle, self._indoor_bike_notification_handler)
+                    self._indoor_bike_handle = indoor_bike_handle
                     self.fitness_machine_notification_active = True
                     logger.info("Started Indoor Bike Data notifications successfully")
                 else:
                     logger.warning("Indoor Bike Data Characteristic not found")
 
                 # Try to activate the trainer
-                if control_point_char:
+                if control_point_handle is not None:
+                    logger.info(f"Found Fitness Machine Control Point Characteristic (handle {control_point_handle})")
                     try:
+                        # FTMS requires acknowledged writes to the Control Point, and
+                        # Start must follow a granted Request Control, so the writes
+                        # stay sequential; skip the acknowledgement only where the
+                        # characteristic allows it
+                        control_point = self.client.services.get_characteristic(control_point_handle)
+                        response = control_point is None or "write-without-response" not in control_point.properties
+                        
                         # Request Control (Op Code 0x00)
-                        await self.client.write_gatt_char(control_point_char, bytearray([0x00]), response=True)
+                        await self.client.write_gatt_char(control_point_handle, bytearray([0x00]), response=response)
                         logger.info("Sent Request Control to Fitness Machine Control Point")
                         
                         # Start or Resume (Op Code 0x07)
-                        await self.client.write_gatt_char(control_point_char, bytearray([0x07]), response=True)
+                        await self.client.write_gatt_char(control_point_handle, bytearray([0x07]), response=response)
                         logger.info("Sent Start/Resume command to Fitness Machine Control Point")
                     except Exception as e:
                         logger.warning(f"Failed to write to Fitness Machine Control Point: {e}")
@@ -147,29 +280,15 @@ class KickrTrainer(BaseDevice):
                 logger.warning("Fitness Machine Service not found")
                 
                 # Fallback to Cycling Power Service
-                power_service = None
-                for service in services:
-                    if service.uuid.lower() == CYCLING_POWER_SERVICE_UUID.lower():
-                        power_service = service
-                        logger.info(f"Found Cycling Power Service: {service.uuid}")
-                        break
-                
-                if power_service:
-                    power_char = None
-                    for char in power_service.characteristics:
-                        if char.uuid.lower() == CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID.lower():
-                            power_char = char
-                            logger.info(f"Found Cycling Power Measurement Characteristic: {char.uuid}")
-                            break
-                    
-                    if power_char:
-                        await self.client.start_notify(power_char, self._power_notification_handler)
-                        self.power_notification_active = True
-                        logger.info("Started power notifications successfully")
-                    else:
-                        logger.warning("Cycling Power Measurement Characteristic not found")
+                power_handle = self._char_handles.get(CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID)
+                if power_handle is not None:
+                    logger.info(f"Found Cycling Power Measurement Characteristic (handle {power_handle})")
+                    await self.client.start_notify(power_handle, self._power_notification_handler)
+                    self._power_handle = power_handle
+                    self.power_notification_active = True
+                    logger.info("Started power notifications successfully")
                 else:
-                    logger.warning("Cycling Power Service not found")
+                    logger.warning("Cycling Power Measurement Characteristic not found")
 
             return True
                 
@@ -181,40 +300,16 @@ class KickrTrainer(BaseDevice):
         """Cleanup device-specific notifications"""
         try:
             if self.fitness_machine_notification_active and self.client:
-                services = self.client.services
-                fitness_machine_service = None
-                for service in services:
-                    if service.uuid.lower() == FITNESS_MACHINE_SERVICE_UUID.lower():
-                        fitness_machine_service = service
-                        break
-                if fitness_machine_service:
-                    indoor_bike_char = None
-                    for char in fitness_machine_service.characteristics:
-                        if char.uuid.lower() == INDOOR_BIKE_DATA_CHARACTERISTIC_UUID.lower():
-                            indoor_bike_char = char
-                            break
-                    if indoor_bike_char:
-                        await self.client.stop_notify(indoor_bike_char)
-                        self.fitness_machine_notification_active = False
-                        logger.info("Stopped Indoor Bike Data notifications")
+                await self.client.stop_notify(self._indoor_bike_handle)
+                self.fitness_machine_notification_active = False
+                self._indoor_bike_handle = None
+                logger.info("Stopped Indoor Bike Data notifications")
 
             if self.power_notification_active and self.client:
-                services = self.client.services
-                power_service = None
-                for service in services:
-                    if service.uuid.lower() == CYCLING_POWER_SERVICE_UUID.lower():
-                        power_service = service
-                        break
-                if power_service:
-                    power_char = None
-                    for char in power_service.characteristics:
-                        if char.uuid.lower() == CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID.lower():
-                            power_char = char
-                            break
-                    if power_char:
-                        await self.client.stop_notify(power_char)
-                        self.power_notification_active = False
-                        logger.info("Stopped power notifications")
+                await self.client.stop_notify(self._power_handle)
+                self.power_notification_active = False
+                self._power_handle = None
+                logger.info("Stopped power notifications")
 
         except Exception as e:
             logger.error(f"Failed to cleanup notifications: {e}")
@@ -223,7 +318,7 @@ class KickrTrainer(BaseDevice):
         """Handle incoming notifications (required by base class)"""
         # This method is required by the base class but we use specific handlers
         # The actual notification handling is done by _indoor_bike_notification_handler
-        # and _power_notification_handler
+        # and _power_notification_handler, which queue frames for the _parse_* methods
         pass
 
     def _calculate_power_based_speed(self, power_watts: int, rider_weight_kg: float, bike_weight_kg: float, crr: float, cda: float, gradient_percent: float) -> float:
@@ -231,175 +326,64 @@ class KickrTrainer(BaseDevice):
         Calculate speed based on power output, mimicking virtual cycling apps.
         Formula adapted from various cycling power models.
         """
-        if power_watts <= 0:
-            return 0.0
-
-        # Constants
-        GRAVITY = 9.8067  # m/s^2
-        AIR_DENSITY = 1.225  # kg/m^3 (at sea level, 15C)
+        return power_based_speed(power_watts, rider_weight_kg, bike_weight_kg, crr, cda, gradient_percent)
 
-        # Convert gradient to decimal
-        gradient = gradient_percent / 100.0
-
-        # Total mass
-        total_mass_kg = rider_weight_kg + bike_weight_kg
-
-        # Forces
-        frr = crr * total_mass_kg * GRAVITY * math.cos(math.atan(gradient))
-        fg = total_mass_kg * GRAVITY * math.sin(math.atan(gradient))
-
-        # Simple iterative solver for speed (v in m/s)
-        v_mps = 0.0  # Initial guess
-        tolerance = 0.01  # m/s
-        max_iterations = 10
-        
-        for _ in range(max_iterations):
-            fa = 0.5 * cda * AIR_DENSITY * v_mps**2
-            total_force = frr + fg + fa
-            
-            if total_force <= 0:
-                if power_watts > 0:
-                    v_mps += 0.1
-                else:
-                    v_mps = 0.0
-                break
-            
-            new_v_mps = power_watts / total_force
-            
-            if abs(new_v_mps - v_mps) < tolerance:
-                v_mps = new_v_mps
-                break
-            v_mps = new_v_mps
-        
-        # Convert m/s to km/h
-        speed_kmh = v_mps * 3.6
-        return max(0.0, speed_kmh)
+    def _calculate_power_based_speed_batch(self, powers: np.ndarray) -> np.ndarray:
+        """Recompute speeds (km/h) for a whole power series with the current rider settings"""
+        return power_based_speed_batch(
+            powers,
+            self.rider_weight_kg,
+            self.bike_weight_kg,
+            self.crr,
+            self.cda,
+            self.gradient_percent
+        )
 
     def _estimate_cadence(self, power_watts: int) -> Optional[int]:
         """Estimate cadence based on power output (simple model)"""
         if power_watts <= 0:
             return 0
-        if power_watts < 50:
-            return 60
-        elif power_watts < 100:
-            return 70
-        elif power_watts < 150:
-            return 80
-        elif power_watts < 200:
-            return 85
-        else:
-            return 90
+        return CADENCE_BY_POWER[power_watts if power_watts < 256 else 255]
 
-    async def _indoor_bike_notification_handler(self, sender, data: bytearray):
+    def _indoor_bike_notification_handler(self, sender, data: bytearray):
         """Handle BLE notifications from Indoor Bike Data characteristic."""
-        logger.debug(f"Raw Indoor Bike Data from {sender.uuid}: {data.hex()}")
+        # Copy, bleak may reuse the buffer; parsing happens on the consumer task
+        self._defer(self._parse_indoor_bike_data, (time.monotonic_ns(), bytes(data)))
+
+    def _sample_log_level(self, received_ns: int) -> int:
+        """INFO for the first sample each SAMPLE_LOG_INTERVAL_NS, DEBUG for the rest"""
+        if received_ns - self._last_info_log_ns >= SAMPLE_LOG_INTERVAL_NS:
+            self._last_info_log_ns = received_ns
+            return logging.INFO
+        return logging.DEBUG
+
+    def _parse_indoor_bike_data(self, frame: Tuple[int, bytes]):
+        """Parse an Indoor Bike Data notification and pass the sample to the callbacks"""
+        received_ns, data = frame
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Raw Indoor Bike Data: %s", data.hex())
         
         if len(data) < 2:
             logger.warning("Received Indoor Bike data too short.")
             return
 
         try:
-            # Parse Indoor Bike Data according to FTMS specification
-            # Flags (2 bytes)
-            flags = struct.unpack('<H', data[0:2])[0]
-            offset = 2
-            
-            # Initialize values
-            instantaneous_speed = None
-            average_speed = None
-            instantaneous_cadence = None
-            average_cadence = None
-            total_distance = None
-            resistance_level = None
-            instantaneous_power = None
-            average_power = None
-            total_energy = None
-            heart_rate = None
-            elapsed_time = None
-            
-            # Parse based on flags
+            # Parse Indoor Bike Data according to FTMS specification:
+            # flags (2 bytes), then the fields they mark present
+            flags = UINT16.unpack_from(data)[0]
             if flags & 0x01:  # More Data
                 logger.debug("More data flag set")
+            fields = indoor_bike_layout(flags).unpack(data)
             
-            if flags & 0x02:  # Average Speed present
-                if offset + 2 <= len(data):
-                    average_speed = struct.unpack('<H', data[offset:offset+2])[0] / 100.0  # 0.01 km/h
-                    offset += 2
-            
-            if flags & 0x04:  # Instantaneous Cadence present
-                if offset + 2 <= len(data):
-                    # CORRECTED: The Kickr seems to use non-standard field order
-                    # Despite setting the cadence flag, bytes 2-3 appear to be speed
-                    # and bytes 4-5 appear to be cadence
-                    instantaneous_speed = struct.unpack('<H', data[offset:offset+2])[0] / 100.0  # 0.01 km/h
-                    offset += 2
-            
-            if flags & 0x08:  # Average Cadence present
-                if offset + 2 <= len(data):
-                    average_cadence = struct.unpack('<H', data[offset:offset+2])[0] / 100.0  # 0.01 RPM
-                    offset += 2
-            
-            if flags & 0x10:  # Total Distance present
-                if offset + 3 <= len(data):
-                    total_distance = struct.unpack('<I', data[offset:offset+3] + b'\x00')[0]  # 1 meter
-                    offset += 3
-            
-            if flags & 0x20:  # Resistance Level present
-                if offset + 2 <= len(data):
-                    resistance_level = struct.unpack('<h', data[offset:offset+2])[0]  # 1 unit
-                    offset += 2
-            
-            if flags & 0x40:  # Instantaneous Power present
-                if offset + 2 <= len(data):
-                    # CORRECTED: The Kickr seems to use non-standard field order
-                    # Despite setting the power flag, bytes 4-5 appear to be cadence
-                    # and bytes 6-7 appear to be power
-                    instantaneous_cadence = struct.unpack('<H', data[offset:offset+2])[0]  # 1 RPM
-                    offset += 2
-            
-            if flags & 0x80:  # Average Power present
-                if offset + 2 <= len(data):
-                    average_power = struct.unpack('<h', data[offset:offset+2])[0]  # 1 watt
-                    offset += 2
-            
-            if flags & 0x100:  # Total Energy present
-                if offset + 2 <= len(data):
-                    total_energy = struct.unpack('<H', data[offset:offset+2])[0]  # 1 kJ
-                    offset += 2
-            
-            if flags & 0x200:  # Energy per Hour present
-                if offset + 2 <= len(data):
-                    energy_per_hour = struct.unpack('<H', data[offset:offset+2])[0]  # 1 kJ
-                    offset += 2
-            
-            if flags & 0x400:  # Energy per Minute present
-                if offset + 1 <= len(data):
-                    energy_per_minute = struct.unpack('<B', data[offset:offset+1])[0]  # 1 kJ
-                    offset += 1
-            
-            if flags & 0x800:  # Heart Rate present
-                if offset + 1 <= len(data):
-                    heart_rate = struct.unpack('<B', data[offset:offset+1])[0]  # 1 BPM
-                    offset += 1
-            
-            if flags & 0x1000:  # Metabolic Equivalent present
-                if offset + 1 <= len(data):
-                    met = struct.unpack('<B', data[offset:offset+1])[0] / 10.0  # 0.1
-                    offset += 1
-            
-            if flags & 0x2000:  # Elapsed Time present
-                if offset + 2 <= len(data):
-                    elapsed_time = struct.unpack('<H', data[offset:offset+2])[0]  # 1 second
-                    offset += 2
-            
-            if flags & 0x4000:  # Remaining Time present
-                if offset + 2 <= len(data):
-                    remaining_time = struct.unpack('<H', data[offset:offset+2])[0]  # 1 second
-                    offset += 2
+            instantaneous_speed = fields.get('instantaneous_speed')
+            if instantaneous_speed is not None:
+                instantaneous_speed /= 100.0  # 0.01 km/h
+            instantaneous_cadence = fields.get('instantaneous_cadence')
+            average_power = fields.get('average_power')
             
             # CORRECTED: Get power from bytes 6-7 (non-standard Kickr behavior)
             if len(data) >= 8:
-                power_from_bytes_6_7 = struct.unpack('<H', data[6:8])[0]
+                power_from_bytes_6_7 = UINT16.unpack_from(data, 6)[0]
                 # Use this power value if it's reasonable (> 0 and < 2000W)
                 if 0 < power_from_bytes_6_7 < 2000:
                     instantaneous_power = power_from_bytes_6_7
@@ -433,34 +417,43 @@ class KickrTrainer(BaseDevice):
                 cadence = 0
 
             power_data = PowerData(
-                timestamp=datetime.now(),
+                timestamp=self._sample_time(received_ns),
                 instantaneous_power=instantaneous_power if instantaneous_power is not None else 0,
                 average_power=average_power,
                 cadence=cadence,
                 speed=speed,
             )
             
-            logger.info(f"Indoor Bike Data: Power={power_data.instantaneous_power}W, Speed={power_data.speed:.1f} km/h, Cadence={power_data.cadence} RPM")
+            level = self._sample_log_level(received_ns)
+            if logger.isEnabledFor(level):
+                logger.log(level, "Indoor Bike Data: Power=%sW, Speed=%.1f km/h, Cadence=%s RPM",
+                           power_data.instantaneous_power, power_data.speed, power_data.cadence)
             self.data_count += 1
             self.last_power_data = power_data
-            self._notify_callbacks(power_data)
+            self._dispatch_callbacks(power_data)
 
         except struct.error as se:
-            logger.error(f"Struct parsing error in _indoor_bike_notification_handler: {se} with data: {data.hex()}")
+            logger.error(f"Struct parsing error in _parse_indoor_bike_data: {se} with data: {data.hex()}")
         except Exception as e:
             logger.error(f"Error parsing Indoor Bike data: {e} with data: {data.hex()}")
 
     def _power_notification_handler(self, sender, data: bytearray):
         """Handle BLE notifications for cycling power measurement (fallback)."""
-        logger.debug(f"Raw power notification from {sender.uuid}: {data.hex()}")
+        # Copy, bleak may reuse the buffer; parsing happens on the consumer task
+        self._defer(self._parse_power_data, (time.monotonic_ns(), bytes(data)))
+
+    def _parse_power_data(self, frame: Tuple[int, bytes]):
+        """Parse a Cycling Power Measurement notification and pass the sample to the callbacks"""
+        received_ns, data = frame
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Raw power notification: %s", data.hex())
         
         if len(data) < 4:
             logger.warning("Received power data too short.")
             return None
 
         try:
-            flags = struct.unpack('<H', data[0:2])[0]
-            instantaneous_power = struct.unpack('<h', data[2:4])[0]
+            flags, instantaneous_power = CYCLING_POWER_HEADER.unpack_from(data)
 
             # Power-based calculations
             speed = self._calculate_power_based_speed(
@@ -474,17 +467,20 @@ class KickrTrainer(BaseDevice):
             cadence = self._estimate_cadence(instantaneous_power)
 
             power_data = PowerData(
-                timestamp=datetime.now(),
+                timestamp=self._sample_time(received_ns),
                 instantaneous_power=instantaneous_power,
                 cadence=cadence,
                 speed=speed,
             )
-            logger.info(f"Power: {power_data.instantaneous_power}W, Speed: {power_data.speed:.1f} km/h, Cadence: {power_data.cadence} RPM")
+            level = self._sample_log_level(received_ns)
+            if logger.isEnabledFor(level):
+                logger.log(level, "Power: %sW, Speed: %.1f km/h, Cadence: %s RPM",
+                           power_data.instantaneous_power, power_data.speed, power_data.cadence)
             self.data_count += 1
             self.last_power_data = power_data
-            self._notify_callbacks(power_data)
+            self._dispatch_callbacks(power_data)
 
         except struct.error as se:
-            logger.error(f"Struct parsing error in _power_notification_handler: {se} with data: {data.hex()}")
+            logger.error(f"Struct parsing error in _parse_power_data: {se} with data: {data.hex()}")
         except Exception as e:
             logger.error(f"Error parsing power data: {e} with data: {data.hex()}")
@@ -4,7 +4,7 @@ Based on Bluetooth GATT Cycling Power Measurement specification
 """
 import asyncio
 import struct
-from datetime import datetime
+import time
 from typing import Optional
 from bleak import BleakClient
 from loguru import logger
@@ -13,6 +13,55 @@ from ..core.base_device import BaseDevice
 from ..core.models import DeviceInfo, DeviceType, PowerData
 from ..core.constants import *
 
+# Cycling Power Measurement field formats, all little-endian
+UINT16 = struct.Struct('<H')
+SINT16 = struct.Struct('<h')
+UINT32 = struct.Struct('<I')
+
+# Accepted notification senders besides the subscribed characteristic object:
+# the characteristic's UUID in full and short form (bleak UUIDs are lowercase)
+POWER_MEASUREMENT_SENDERS = frozenset((CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID, '2a63'))
+
+# Optional fields after flags and power that are parsed, in frame order:
+# (flag, Struct, field names)
+CYCLING_POWER_FIELDS = (
+    (0x04, UINT16, ('accumulated_torque',)),
+    (0x10, struct.Struct('<IH'), ('wheel_revs', 'wheel_time')),
+    (0x20, struct.Struct('<HH'), ('crank_revs', 'crank_time')),
+)
+CYCLING_POWER_LAYOUT_FLAGS = 0x34
+
+
+def _cycling_power_layout(flags: int):
+    """Struct and field names for a complete frame with these optional fields"""
+    fmt = '<Hh'
+    names = ('flags', 'instantaneous_power')
+    for flag, field_struct, field_names in CYCLING_POWER_FIELDS:
+        if flags & flag:
+            fmt += field_struct.format.lstrip('<')
+            names += field_names
+    return struct.Struct(fmt), names
+
+
+# One precompiled layout per combination of the optional fields
+CYCLING_POWER_LAYOUTS = {
+    flags: _cycling_power_layout(flags)
+    for flags in range(CYCLING_POWER_LAYOUT_FLAGS + 1)
+    if flags & ~CYCLING_POWER_LAYOUT_FLAGS == 0
+}
+
+
+def _unpack_cycling_power_fields(data: bytearray, flags: int) -> dict:
+    """Field by field parse for frames too short for their layout; a field that
+    doesn't fit is left out"""
+    fields = {'flags': flags, 'instantaneous_power': SINT16.unpack_from(data, 2)[0]}
+    offset = 4
+    for flag, field_struct, field_names in CYCLING_POWER_FIELDS:
+        if flags & flag and len(data) >= offset + field_struct.size:
+            fields.update(zip(field_names, field_struct.unpack_from(data, offset)))
+            offset += field_struct.size
+    return fields
+
 
 class KickrTrainerFixed(BaseDevice):
     """Fixed Wahoo Kickr Smart Trainer device with correct data parsing"""
@@ -22,8 +71,15 @@ class KickrTrainerFixed(BaseDevice):
         self.power_notification_active = False
         self.data_count = 0
         self.last_power_data = None
+        # Power measurement characteristic found by _setup_notifications
+        self._power_char = None
+        # Set on the next notification while test_connection is waiting
+        self._data_event: Optional[asyncio.Event] = None
         self.prev_wheel_revs = 0
         self.prev_wheel_time = 0
+        # None until the first crank revolution data arrives
+        self.prev_crank_revs: Optional[int] = None
+        self.prev_crank_time: Optional[int] = None
         self.wheel_circumference = 2.1  # meters (typical road bike)
         
     @classmethod
@@ -45,25 +101,9 @@ class KickrTrainerFixed(BaseDevice):
             return
             
         try:
-            # Find the cycling power service
-            power_service = None
-            for service in self.client.services:
-                if (service.uuid == CYCLING_POWER_SERVICE_UUID or 
-                    "1818" in service.uuid.upper()):
-                    power_service = service
-                    break
-            
-            if not power_service:
-                logger.error("Cycling Power Service not found!")
-                return
-            
-            # Find the power measurement characteristic
-            power_char = None
-            for char in power_service.characteristics:
-                if (char.uuid == CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID or
-                    "2A63" in char.uuid.upper()):
-                    power_char = char
-                    break
+            # Find the power measurement characteristic; bleak indexes the
+            # characteristics by UUID and normalizes the one asked for
+            power_char = self.client.services.get_characteristic(CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID)
             
             if not power_char:
                 logger.error("Power measurement characteristic not found!")
@@ -75,7 +115,8 @@ class KickrTrainerFixed(BaseDevice):
             
             # Subscribe to power measurements
             logger.info("Subscribing to power measurements...")
-            await self.client.start_notify(power_char.uuid, self._notification_handler)
+            await self.client.start_notify(power_char, self._notification_handler)
+            self._power_char = power_char
             self.power_notification_active = True
             logger.info("✅ Successfully subscribed to power measurements")
             
@@ -87,37 +128,28 @@ class KickrTrainerFixed(BaseDevice):
         """Cleanup power measurement notifications"""
         if self.client and self.power_notification_active:
             try:
-                # Find the power characteristic again
-                power_char = None
-                for service in self.client.services:
-                    if (service.uuid == CYCLING_POWER_SERVICE_UUID or 
-                        "1818" in service.uuid.upper()):
-                        for char in service.characteristics:
-                            if (char.uuid == CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID or
-                                "2A63" in char.uuid.upper()):
-                                power_char = char
-                                break
-                        break
-                
-                if power_char:
-                    await self.client.stop_notify(power_char.uuid)
+                if self._power_char:
+                    await self.client.stop_notify(self._power_char)
+                    self._power_char = None
                     self.power_notification_active = False
                     logger.info("Unsubscribed from power measurements")
             except Exception as e:
                 logger.error(f"Error unsubscribing from power measurements: {e}")
     
-    async def _notification_handler(self, sender, data: bytearray):
+    def _notification_handler(self, sender, data: bytearray):
         """Handle power measurement notifications with correct parsing"""
+        received_ns = time.monotonic_ns()
         self.data_count += 1
+        if self._data_event is not None:
+            self._data_event.set()
         
-        # Convert sender to string for comparison
-        sender_str = str(sender)
-        
-        logger.debug(f"Data #{self.data_count} from {sender_str}: {data.hex()}")
+        # Loguru only formats a message some sink will take; lazy=True also
+        # defers the hex dump of the frame until then
+        logger.opt(lazy=True).debug("Data #{} from {}: {}", lambda: self.data_count, lambda: sender, data.hex)
         
-        if (sender_str == CYCLING_POWER_MEASUREMENT_CHARACTERISTIC_UUID or 
-            "2A63" in sender_str.upper()):
-            power_data = self._parse_cycling_power_data(data)
+        # Bleak passes the characteristic object subscribed to as the sender
+        if sender is self._power_char or getattr(sender, 'uuid', sender) in POWER_MEASUREMENT_SENDERS:
+            power_data = self._parse_cycling_power_data(data, received_ns)
             if power_data:
                 self.last_power_data = power_data
                 logger.info(f"Power: {power_data.instantaneous_power}W, "
@@ -127,100 +159,83 @@ class KickrTrainerFixed(BaseDevice):
             else:
                 logger.warning("Failed to parse power data")
     
-    def _parse_cycling_power_data(self, data: bytearray) -> Optional[PowerData]:
-        """Parse cycling power measurement data according to Bluetooth GATT spec"""
+    def _parse_cycling_power_data(self, data: bytearray, received_ns: Optional[int] = None) -> Optional[PowerData]:
+        """Parse cycling power measurement data according to Bluetooth GATT spec
+        
+        received_ns is the time.monotonic_ns() the notification arrived at, now if omitted.
+        """
         if len(data) < 4:
             logger.warning(f"Insufficient data for power measurement: {len(data)} bytes")
             return None
         
         try:
-            # Parse flags (first 2 bytes, little-endian)
-            flags = struct.unpack('<H', data[0:2])[0]
-            logger.debug(f"Flags: 0x{flags:04x} ({flags:016b})")
-            
-            # Parse instantaneous power (bytes 2-3, little-endian, signed)
-            instantaneous_power = struct.unpack('<h', data[2:4])[0]
+            # Flags, instantaneous power and the optional fields handled
+            # below, in one unpack when the frame is complete
+            flags = UINT16.unpack_from(data)[0]
+            logger.debug("Flags: 0x{:04x} ({:016b})", flags, flags)
+            layout, names = CYCLING_POWER_LAYOUTS[flags & CYCLING_POWER_LAYOUT_FLAGS]
+            if len(data) >= layout.size:
+                fields = dict(zip(names, layout.unpack_from(data)))
+            else:
+                fields = _unpack_cycling_power_fields(data, flags)
+            instantaneous_power = fields['instantaneous_power']
             
             # Initialize variables
             cadence = None
             speed = None
             distance = None
             
-            # Parse additional data based on flags
-            offset = 4
+            # Accumulated torque (bit 2)
+            if 'accumulated_torque' in fields:
+                logger.debug("Accumulated torque: {}", fields['accumulated_torque'])
             
-            # Check if accumulated torque is present (bit 2)
-            if flags & 0x04:
-                if len(data) >= offset + 2:
-                    accumulated_torque = struct.unpack('<H', data[offset:offset+2])[0]
-                    logger.debug(f"Accumulated torque: {accumulated_torque}")
-                    offset += 2
-            
-            # Check if wheel revolution data is present (bit 4)
-            if flags & 0x10:
-                if len(data) >= offset + 6:
-                    # Cumulative wheel revolutions (4 bytes)
-                    wheel_revs = struct.unpack('<I', data[offset:offset+4])[0]
-                    # Last wheel event time (2 bytes, 1/2048 second units)
-                    wheel_time = struct.unpack('<H', data[offset+4:offset+6])[0]
-                    
-                    logger.debug(f"Wheel revs: {wheel_revs}, Wheel time: {wheel_time}")
+            # Wheel revolution data (bit 4)
+            if 'wheel_revs' in fields:
+                # Cumulative wheel revolutions and last wheel event time (1/2048 second units)
+                wheel_revs = fields['wheel_revs']
+                wheel_time = fields['wheel_time']
+                
+                logger.debug("Wheel revs: {}, Wheel time: {}", wheel_revs, wheel_time)
+                
+                # Calculate speed and distance
+                if self.prev_wheel_time != 0 and wheel_time != self.prev_wheel_time:
+                    # Calculate RPM and speed
+                    time_diff = (wheel_time - self.prev_wheel_time) / 2048.0  # Convert to seconds
+                    rev_diff = wheel_revs - self.prev_wheel_revs
                     
-                    # Calculate speed and distance
-                    if self.prev_wheel_time != 0 and wheel_time != self.prev_wheel_time:
-                        # Calculate RPM and speed
-                        time_diff = (wheel_time - self.prev_wheel_time) / 2048.0  # Convert to seconds
-                        rev_diff = wheel_revs - self.prev_wheel_revs
+                    if time_diff > 0:
+                        rpm = (rev_diff * 60.0) / time_diff
+                        speed = (rpm * self.wheel_circumference * 60.0) / 1000.0  # km/h
+                        distance = (rev_diff * self.wheel_circumference) / 1000.0  # km
                         
-                        if time_diff > 0:
-                            rpm = (rev_diff * 60.0) / time_diff
-                            speed = (rpm * self.wheel_circumference * 60.0) / 1000.0  # km/h
-                            distance = (rev_diff * self.wheel_circumference) / 1000.0  # km
-                            
-                            logger.debug(f"Calculated speed: {speed:.2f} km/h, distance: {distance:.3f} km")
-                    
-                    self.prev_wheel_revs = wheel_revs
-                    self.prev_wheel_time = wheel_time
-                    offset += 6
-            
-            # Check if crank revolution data is present (bit 5) - this is cadence
-            if flags & 0x20:
-                if len(data) >= offset + 4:
-                    # Cumulative crank revolutions (2 bytes)
-                    crank_revs = struct.unpack('<H', data[offset:offset+2])[0]
-                    # Last crank event time (2 bytes, 1/1024 second units)
-                    crank_time = struct.unpack('<H', data[offset+2:offset+4])[0]
-                    
-                    logger.debug(f"Crank revs: {crank_revs}, Crank time: {crank_time}")
-                    
-                    # Calculate cadence (simplified - would need previous values for accurate calculation)
-                    if crank_time > 0:
-                        # This is a simplified calculation - real implementation would need to track previous values
-                        cadence = 0  # Placeholder - would need proper calculation
-                    
-                    offset += 4
+                        logger.debug("Calculated speed: {:.2f} km/h, distance: {:.3f} km", speed, distance)
+                
+                self.prev_wheel_revs = wheel_revs
+                self.prev_wheel_time = wheel_time
             
-            # For now, let's use a simple approach and assume cadence is in a different position
-            # Based on the debug output, let's try to find cadence in the data
-            if len(data) >= 8:
-                # Try different positions for cadence
-                cadence_candidate1 = struct.unpack('<H', data[4:6])[0]
-                cadence_candidate2 = struct.unpack('<H', data[6:8])[0]
+            # Crank revolution data (bit 5) - this is cadence
+            if 'crank_revs' in fields:
+                # Cumulative crank revolutions and last crank event time (1/1024 second units)
+                crank_revs = fields['crank_revs']
+                crank_time = fields['crank_time']
                 
-                # Use the more reasonable value (RPM should be 0-200 typically)
-                if 0 <= cadence_candidate1 <= 200:
-                    cadence = cadence_candidate1
-                elif 0 <= cadence_candidate2 <= 200:
-                    cadence = cadence_candidate2
-                else:
-                    # If neither looks like cadence, try dividing by 100 (in case it's scaled)
-                    if 0 <= cadence_candidate1 / 100 <= 200:
-                        cadence = cadence_candidate1 / 100
-                    elif 0 <= cadence_candidate2 / 100 <= 200:
-                        cadence = cadence_candidate2 / 100
+                logger.debug("Crank revs: {}, Crank time: {}", crank_revs, crank_time)
+                
+                # Cadence from the crank events since the previous frame; both
+                # counters are 16-bit and wrap around
+                if self.prev_crank_time is not None:
+                    time_diff = ((crank_time - self.prev_crank_time) & 0xFFFF) / 1024.0  # Convert to seconds
+                    rev_diff = (crank_revs - self.prev_crank_revs) & 0xFFFF
+                    if time_diff > 0:
+                        cadence = round(rev_diff * 60.0 / time_diff)
+                
+                self.prev_crank_revs = crank_revs
+                self.prev_crank_time = crank_time
             
+            if received_ns is None:
+                received_ns = time.monotonic_ns()
             power_data = PowerData(
-                timestamp=datetime.now(),
+                timestamp=self._sample_time(received_ns),
                 instantaneous_power=instantaneous_power,
                 cadence=cadence,
                 speed=speed,
@@ -264,13 +279,17 @@ class KickrTrainerFixed(BaseDevice):
         
         logger.info("Waiting for data... (try pedaling your Kickr)")
         
-        # Wait for data for 10 seconds
-        start_time = datetime.now()
-        while (datetime.now() - start_time).total_seconds() < 10:
-            if self.data_count > 0:
-                logger.info(f"✅ Data received! Count: {self.data_count}")
-                return True
-            await asyncio.sleep(0.5)
+        # Wait for data for 10 seconds; the event is created here so it
+        # belongs to the running loop
+        if self.data_count == 0:
+            self._data_event = asyncio.Event()
+            try:
+                await asyncio.wait_for(self._data_event.wait(), timeout=10)
+            except asyncio.TimeoutError:
+                logger.warning("No data received in 10 seconds")
+                return False
+            finally:
+                self._data_event = None
         
-        logger.warning("No data received in 10 seconds")
-        return False
+        logger.info(f"✅ Data received! Count: {self.data_count}")
+        return True
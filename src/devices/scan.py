@@ -0,0 +1,30 @@
+"""
+Shared BLE scan helper for the device scripts
+"""
+import time
+from typing import Dict, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from bleak.backends.device import BLEDevice
+
+# Results of recent scans, keyed by the service UUID filter they used
+_scan_cache: Dict[Tuple[str, ...], Tuple[float, List["BLEDevice"]]] = {}
+
+
+async def scan_once(timeout: float = 5.0, service_uuids: Optional[Sequence[str]] = None,
+                    ttl: float = 3.0) -> List["BLEDevice"]:
+    """Scan for BLE devices, reusing a scan made less than ttl seconds ago
+
+    service_uuids is handed to the scanner, so devices that don't advertise
+    any of those services are filtered out by the OS rather than in Python.
+    """
+    from bleak import BleakScanner
+
+    key = tuple(sorted(uuid.lower() for uuid in service_uuids)) if service_uuids else ()
+    entry = _scan_cache.get(key)
+    if entry and time.monotonic() - entry[0] < ttl:
+        return entry[1]
+
+    devices = await BleakScanner.discover(timeout=timeout, service_uuids=list(key) or None)
+    _scan_cache[key] = (time.monotonic(), devices)
+    return devices
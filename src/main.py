@@ -34,8 +34,12 @@ class LinuxTrainerApp:
         signal.signal(signal.SIGTERM, self._signal_handler)
         
         try:
-            # Scan for devices
-            devices = await KickrTrainer.scan_for_devices(timeout=10.0)
+            # Save any session a previous crash left in an autosave log
+            for session_id in self.session_manager.recover_sessions():
+                logger.info(f"Recovered unfinished session: {session_id}")
+            
+            # Scan for devices; the first trainer found is used, so stop there
+            devices = await KickrTrainer.scan_for_devices(timeout=10.0, count=1)
             
             if not devices:
                 logger.error("No Kickr devices found")
@@ -167,7 +171,7 @@ class LinuxTrainerApp:
             session = self.session_manager.end_session()
             if session and session.power_data:
                 try:
-                    exports = self.data_exporter.export_all_formats(session)
+                    exports = await self.data_exporter.export_all_formats_async(session)
                     logger.info(f"Exported session data: {list(exports.keys())}")
                 except Exception as e:
                     logger.error(f"Failed to export session data: {e}")
@@ -56,7 +56,7 @@ async def export_session(session_id: str, format_type: str = "all"):
     
     try:
         if format_type == "all":
-            exports = data_exporter.export_all_formats(session)
+            exports = await data_exporter.export_all_formats_async(session)
             print(f"Exported session to: {list(exports.keys())}")
         elif format_type == "csv":
             filepath = data_exporter.export_to_csv(session)
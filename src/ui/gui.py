@@ -331,9 +331,16 @@ class LinuxTrainerGUI:
             messagebox.showwarning("Warning", "No training session to export!")
             return
             
+        # Export on the exporter's writer thread; the result is shown back on
+        # the Tk thread once it's done
+        self.log_message("Exporting data...")
+        future = self.data_exporter.export_all_formats_in_background(self.current_session)
+        future.add_done_callback(lambda done: self.root.after(0, self.on_export_done, done))
+        
+    def on_export_done(self, future):
+        """Report the result of a background export"""
         try:
-            # Export data
-            exports = self.data_exporter.export_all_formats(self.current_session)
+            exports = future.result()
             
             message = "Data exported successfully!\n\n"
             for format_type, filepath in exports.items():
@@ -134,7 +134,7 @@ class LiveDisplay:
             table.add_row("Data Points", str(len(power_data)))
             table.add_row("Avg Power", f"{avg_power:.0f}W")
             table.add_row("Max Power", f"{max_power}W")
-            table.add_row("Distance", f"{self.session.total_distance:.2f} km")
+            table.add_row("Distance", f"{self.session.distance_km():.2f} km")
             table.add_row("Energy", f"{self.session.total_energy:.1f} kJ")
             
             content = table
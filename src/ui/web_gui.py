@@ -227,8 +227,9 @@ class LinuxTrainerWebGUI:
                 if not self.current_session:
                     return jsonify({'success': False, 'message': 'No active session to export'})
                 
-                # Export data
-                export_paths = self.data_exporter.export_all_formats(self.current_session)
+                # Export a snapshot of the session on the exporter's writer
+                # thread, so samples keep being recorded meanwhile
+                export_paths = self.data_exporter.export_all_formats_in_background(self.current_session).result()
                 self.connection_log.add_log("📁 Data exported successfully", "SUCCESS")
                 return jsonify({'success': True, 'message': 'Data exported successfully', 'paths': export_paths})
                 
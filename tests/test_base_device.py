@@ -0,0 +1,46 @@
+"""
+Tests for the BLE device base class
+"""
+import asyncio
+import pytest
+from src.core import base_device
+from src.devices.kickr_trainer import KickrTrainer
+
+
+def test_sequential_scans_share_scanner(monkeypatch):
+    """Test back-to-back scans on one event loop reuse its scanner"""
+    bleak = pytest.importorskip("bleak")
+    scanners = []
+
+    class FakeScanner:
+        def __init__(self, detection_callback):
+            self.running = False
+            scanners.append(self)
+
+        async def start(self):
+            assert not self.running
+            self.running = True
+
+        async def stop(self):
+            assert self.running
+            self.running = False
+
+    monkeypatch.setattr(bleak, "BleakScanner", FakeScanner)
+
+    async def scan_twice():
+        await KickrTrainer.scan_for_devices(timeout=0.01)
+        await KickrTrainer.scan_for_devices(timeout=0.01)
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(scan_twice())
+        assert len(scanners) == 1
+        assert not scanners[0].running
+        assert loop in base_device._scanners
+    finally:
+        loop.close()
+
+    # A closed loop's scanner is dropped when the next scan looks for its own
+    asyncio.run(scan_twice())
+    assert len(scanners) == 2
+    assert loop not in base_device._scanners
@@ -0,0 +1,51 @@
+"""
+Tests for data export
+"""
+import pytest
+from datetime import datetime, timedelta
+from src.core.data_export import DataExporter
+from src.core.models import PowerData, HeartRateData, TrainingSession
+
+
+def test_csv_writers_match(tmp_path):
+    """Test the pandas and csv module CSV writers produce the same file"""
+    pytest.importorskip("pandas")
+    start_time = datetime(2025, 1, 1, 10, 0, 0)
+    session = TrainingSession(session_id="test-session-123", start_time=start_time)
+    for second, watts, cadence, speed in [(0, 200, 90, 25.5), (1, 210, None, None), (2, 0, 85, 30.25)]:
+        session.add_power_data(PowerData(
+            timestamp=start_time + timedelta(seconds=second),
+            instantaneous_power=watts,
+            cadence=cadence,
+            speed=speed
+        ))
+    session.add_power_data(PowerData(
+        timestamp=start_time + timedelta(seconds=3, microseconds=250000),
+        instantaneous_power=220,
+        distance=12.5
+    ))
+    # A glitched speed beyond the 0.01 km/h column range and one with more
+    # precision than it holds are both exported as recorded
+    for second, speed in [(5, 700.0), (6, 38.7072)]:
+        session.add_power_data(PowerData(
+            timestamp=start_time + timedelta(seconds=second),
+            instantaneous_power=230,
+            cadence=88,
+            speed=speed
+        ))
+    for second in (1, 4):
+        session.heart_rate_data.append(HeartRateData(
+            timestamp=start_time + timedelta(seconds=second),
+            heart_rate=140
+        ))
+    
+    exporter = DataExporter(export_dir=str(tmp_path))
+    exporter._write_csv_frame(session, tmp_path / "frame.csv")
+    exporter._write_csv_rows(session, tmp_path / "rows.csv")
+    
+    frame = (tmp_path / "frame.csv").read_text()
+    assert frame == (tmp_path / "rows.csv").read_text()
+    assert "2025-01-01T10:00:00," in frame
+    assert "2025-01-01T10:00:03.250000," in frame
+    assert ",88,700.0," in frame
+    assert ",88,38.7072," in frame
@@ -2,7 +2,7 @@
 Tests for data models
 """
 import pytest
-from datetime import datetime
+from datetime import datetime, timedelta
 from src.core.models import PowerData, HeartRateData, TrainingSession, DeviceInfo, DeviceType
 
 
@@ -20,6 +20,8 @@ def test_power_data_creation():
     assert power_data.instantaneous_power == 200
     assert power_data.cadence == 90
     assert power_data.speed == 25.5
+    assert not hasattr(power_data, '__dict__')
+    assert power_data == PowerData(timestamp=timestamp, instantaneous_power=200, cadence=90, speed=25.5)
 
 
 def test_heart_rate_data_creation():
@@ -74,3 +76,90 @@ def test_device_info_creation():
     assert device_info.name == "Test Kickr"
     assert device_info.device_type == DeviceType.SMART_TRAINER
     assert device_info.rssi == -50
+
+
+def test_training_session_power_array():
+    """Test TrainingSession.power_array column view"""
+    start_time = datetime(2025, 1, 1, 10, 0, 0)
+    session = TrainingSession(session_id="test-session-123", start_time=start_time)
+    session.power_data.append(PowerData(timestamp=start_time, instantaneous_power=200, cadence=90, speed=25.5))
+    session.power_data.append(PowerData(timestamp=start_time, instantaneous_power=210))
+    
+    power = session.power_array()
+    
+    assert len(power) == 2
+    assert power['timestamp'][0].item() == start_time
+    assert power['instantaneous_power'].tolist() == [200, 210]
+    assert power['cadence'].tolist() == [90, 0]
+    assert power['speed_chkmh'].tolist() == [2550, 0]
+
+
+def test_training_session_add_power_data():
+    """Test add_power_data keeps power_array in step with power_data"""
+    start_time = datetime(2025, 1, 1, 10, 0, 0)
+    session = TrainingSession(session_id="test-session-123", start_time=start_time)
+    for watts in range(5000):
+        session.add_power_data(PowerData(timestamp=start_time, instantaneous_power=watts))
+    
+    assert len(session.power_data) == 5000
+    assert session.power_count == 5000
+    assert session.max_power == 4999
+    assert session.avg_power == 2499.5
+    assert session.power_array()['instantaneous_power'].tolist() == list(range(5000))
+    
+    session.power_data.append(PowerData(timestamp=start_time, instantaneous_power=42, speed=30.0))
+    session.add_power_data(PowerData(timestamp=start_time, instantaneous_power=43))
+    
+    power = session.power_array()
+    assert len(power) == 5002
+    assert power['instantaneous_power'][-2:].tolist() == [42, 43]
+    assert power['speed_chkmh'][-2] == 3000
+
+
+def test_training_session_distance_km():
+    """Test distance_km integrates speed over time"""
+    start_time = datetime(2025, 1, 1, 10, 0, 0)
+    session = TrainingSession(session_id="test-session-123", start_time=start_time)
+    assert session.distance_km() == 0.0
+    
+    # 36 km/h for 10s, then ramping down to 0 km/h over another 10s
+    for second, speed in [(0, 36.0), (10, 36.0), (20, 0.0)]:
+        session.add_power_data(PowerData(
+            timestamp=start_time + timedelta(seconds=second),
+            instantaneous_power=200,
+            speed=speed
+        ))
+    
+    assert session.distance_km() == pytest.approx(0.15)
+
+
+def test_training_session_power_array_clips_glitches():
+    """Test out-of-range samples are clipped to the column range instead of raising"""
+    start_time = datetime(2025, 1, 1, 10, 0, 0)
+    session = TrainingSession(session_id="test-session-123", start_time=start_time)
+    session.add_power_data(PowerData(timestamp=start_time, instantaneous_power=200,
+                                     cadence=70000, speed=700.0))
+    session.add_power_data(PowerData(timestamp=start_time + timedelta(seconds=1),
+                                     instantaneous_power=200, speed=-5.0))
+    session.power_data.append(PowerData(timestamp=start_time + timedelta(seconds=2),
+                                        instantaneous_power=200, speed=700.0))
+    
+    power = session.power_array()
+    assert len(power) == 3
+    assert power['cadence'].tolist() == [65535, 0, 0]
+    assert power['speed_chkmh'].tolist() == [65535, 0, 65535]
+    assert session.distance_km() > 0
+
+
+def test_training_session_snapshot():
+    """Test snapshot is unaffected by samples added afterwards"""
+    start_time = datetime(2025, 1, 1, 10, 0, 0)
+    session = TrainingSession(session_id="test-session-123", start_time=start_time)
+    session.add_power_data(PowerData(timestamp=start_time, instantaneous_power=200))
+    
+    snapshot = session.snapshot()
+    session.add_power_data(PowerData(timestamp=start_time + timedelta(seconds=1), instantaneous_power=210))
+    
+    assert len(snapshot.power_data) == 1
+    assert snapshot.power_array()['instantaneous_power'].tolist() == [200]
+    assert session.power_array()['instantaneous_power'].tolist() == [200, 210]